@@ -1,8 +1,11 @@
 """API endpoints for accident history and analysis."""
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import Optional
 from datetime import datetime
 from supabase import Client
+import orjson
 
 from app.api.schemas.accident import (
     AccidentHistoryResponse, AccidentHotspotsResponse
@@ -85,6 +88,80 @@ async def get_accident_history(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/stream")
+async def stream_accident_history(
+    start_date: Optional[datetime] = Query(None, description="Filter accidents after this date"),
+    end_date: Optional[datetime] = Query(None, description="Filter accidents before this date"),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90, description="Minimum latitude for bounding box"),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90, description="Maximum latitude for bounding box"),
+    min_lng: Optional[float] = Query(None, ge=-180, le=180, description="Minimum longitude for bounding box"),
+    max_lng: Optional[float] = Query(None, ge=-180, le=180, description="Maximum longitude for bounding box"),
+    page: int = Query(1, ge=1, description="Page number (1-indexed)"),
+    page_size: int = Query(100, ge=1, le=1000, description="Results per page"),
+    db: Client = Depends(get_db)
+):
+    """
+    Stream historical accident data with optional filtering.
+
+    Same filters and JSON shape as /history, but rows are written to the
+    response as they are fetched, so large pages are never fully buffered.
+
+    Args:
+        start_date: Filter accidents after this datetime
+        end_date: Filter accidents before this datetime
+        min_lat: Minimum latitude for bounding box filter
+        max_lat: Maximum latitude for bounding box filter
+        min_lng: Minimum longitude for bounding box filter
+        max_lng: Maximum longitude for bounding box filter
+        page: Page number (default 1)
+        page_size: Results per page (default 100, max 1000)
+
+    Returns:
+        Streamed JSON with total count and accident list
+    """
+    db_service = SupabaseService(db)
+    accident_service = AccidentHistoryService(db_service)
+    bounds = dict(
+        start_date=start_date,
+        end_date=end_date,
+        min_lat=min_lat,
+        max_lat=max_lat,
+        min_lng=min_lng,
+        max_lng=max_lng
+    )
+
+    rows = accident_service.get_accident_history_iter(**bounds, page=page, page_size=page_size)
+
+    try:
+        # Count and fetch the first chunk up front so query errors still surface as a proper 500
+        total, first = await asyncio.gather(
+            accident_service.count_accident_history(**bounds),
+            anext(rows, None)
+        )
+    except Exception as e:
+        await rows.aclose()
+        logger.error(f"Error fetching accident history: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def _generate():
+        yield b'{"total":%d,"page":%d,"page_size":%d,"accidents":[' % (total, page, page_size)
+        try:
+            if first is not None:
+                yield orjson.dumps(first)
+                async for row in rows:
+                    yield b"," + orjson.dumps(row)
+        except Exception as e:
+            # Headers are already sent, so end with valid JSON that flags the truncation
+            logger.error(f"Accident history stream interrupted: {e}", exc_info=True)
+            yield b'],"error":"Stream interrupted"}'
+            return
+        finally:
+            await rows.aclose()
+        yield b"]}"
+
+    return StreamingResponse(_generate(), media_type="application/json")
+
+
 @router.get("/hotspots", response_model=AccidentHotspotsResponse)
 async def get_accident_hotspots(
     min_accidents: int = Query(2, ge=2, le=10, description="Minimum number of accidents to qualify as hotspot"),
@@ -195,3 +272,41 @@ async def get_accident_trends(
     except Exception as e:
         logger.error(f"Error fetching accident trends: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/dashboard")
+async def get_accident_dashboard(
+    start_date: Optional[datetime] = Query(None, description="Start date for statistics"),
+    end_date: Optional[datetime] = Query(None, description="End date for statistics"),
+    days: int = Query(30, ge=1, le=365, description="Number of days to analyze for trends"),
+    db: Client = Depends(get_db)
+):
+    """
+    Get accident statistics and trends together.
+
+    Computes both from a single database scan instead of separate
+    /statistics and /trends calls.
+
+    Args:
+        start_date: Start date for statistics period (optional)
+        end_date: End date for statistics period (optional)
+        days: Number of days to analyze for trends (default 30, max 365)
+
+    Returns:
+        Dictionary with "statistics" and "trends" sections
+    """
+    try:
+        db_service = SupabaseService(db)
+        accident_service = AccidentHistoryService(db_service)
+
+        dashboard = await accident_service.get_dashboard(
+            start_date=start_date,
+            end_date=end_date,
+            days=days
+        )
+
+        return dashboard
+
+    except Exception as e:
+        logger.error(f"Error fetching accident dashboard: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,4 +1,5 @@
 """API endpoints for issues management."""
+import asyncio
 import logging
 from datetime import datetime
 from typing import List, Optional
@@ -312,7 +313,7 @@ async def delete_issue_endpoint(
         
         if issue.get('image_url'):
             filename = issue['image_url'].replace('uploads/', '')
-            delete_image(filename)
+            await asyncio.to_thread(delete_image, filename)
         
         await db_service.delete_issue(issue_id)
         logger.info(f"Deleted issue {issue_id}")
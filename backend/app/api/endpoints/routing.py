@@ -1,12 +1,14 @@
 """API endpoints for route planning."""
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from supabase import Client
 from datetime import datetime
+import orjson
 
 from app.api.schemas.routing import RoutePlanRequest, RouteResponse
 from app.core.dependencies import get_db
 from app.services.supabase_service import SupabaseService
-from app.services.ml_routing_service import plan_route_ml
+from app.services.ml_routing_service import plan_route_ml, plan_route_ml_stream
 from app.utils.validators import validate_gps_coordinates
 import logging
 
@@ -59,3 +61,53 @@ async def plan_route_endpoint(
     except Exception as e:
         logger.error(f"Error planning route: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/stream")
+async def plan_route_stream_endpoint(
+    request: RoutePlanRequest,
+    db: Client = Depends(get_db)
+):
+    """
+    Plan a route, streaming the result as server-sent events.
+    
+    Events (in order):
+    - metrics: predicted route metrics, sent as soon as they are known
+    - explanation: explanation text deltas while it is generated
+    - route: final route type, path and full explanation
+    """
+    validate_gps_coordinates(request.origin_lat, request.origin_lng)
+    validate_gps_coordinates(request.destination_lat, request.destination_lng)
+    
+    try:
+        db_service = SupabaseService(db)
+        
+        issues = await db_service.get_issues(limit=500)
+        traffic = await db_service.get_traffic_segments()
+        noise = await db_service.get_noise_segments()
+    except Exception as e:
+        logger.error(f"Error loading route context: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def _generate():
+        async for update in plan_route_ml_stream(
+            origin_lat=request.origin_lat,
+            origin_lng=request.origin_lng,
+            dest_lat=request.destination_lat,
+            dest_lng=request.destination_lng,
+            route_type=request.route_type,
+            issues=issues,
+            traffic=traffic,
+            noise=noise,
+            time_of_day=datetime.utcnow(),
+            weather=None
+        ):
+            if "metrics" in update:
+                event, data = b"metrics", update["metrics"]
+            elif "explanation_delta" in update:
+                event, data = b"explanation", update["explanation_delta"]
+            else:
+                event, data = b"route", update
+            yield b"event: " + event + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+    
+    return StreamingResponse(_generate(), media_type="text/event-stream")
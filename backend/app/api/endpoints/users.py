@@ -10,7 +10,7 @@ from app.api.schemas.user import (
 from app.core.dependencies import get_db
 from app.services.supabase_service import SupabaseService
 from app.services.gamification_service import GamificationService
-from app.utils.cache import cached_response, LEADERBOARD_CACHE, invalidate_cache
+from app.utils.cache import cached_response, LEADERBOARD_CACHE, USER_COUNT_CACHE, invalidate_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -55,8 +55,9 @@ async def create_user(
 
         created_user = await db_service.create_user(user_dict)
 
-        # Invalidate leaderboard cache
+        # Invalidate leaderboard and user count caches
         invalidate_cache(LEADERBOARD_CACHE)
+        invalidate_cache(USER_COUNT_CACHE)
 
         logger.info(f"Created user {created_user['id']} with username {user_data.username}")
         return created_user
@@ -127,6 +128,8 @@ async def update_user(
             raise HTTPException(status_code=400, detail="No update data provided")
 
         updated = await db_service.update_user(user_id, update_dict)
+        if not updated:
+            raise HTTPException(status_code=404, detail="User not found")
 
         logger.info(f"Updated user {user_id}")
         return updated
@@ -63,6 +63,7 @@ class UserResponse(BaseModel):
     avatar_url: Optional[str]
     total_points: int
     rank: int
+    rank_updated_at: Optional[datetime] = None
     issues_reported: int
     issues_verified: int
     created_at: datetime
@@ -2,6 +2,7 @@
 Configuration module for NeuraCity backend.
 Loads and validates all environment variables with proper defaults.
 """
+from pydantic import Field
 from pydantic_settings import BaseSettings
 from typing import List
 from functools import lru_cache
@@ -35,6 +36,7 @@ class Settings(BaseSettings):
     # File Upload Configuration
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10 MB
     ALLOWED_IMAGE_TYPES: List[str] = ["image/jpeg", "image/jpg", "image/png", "image/webp"]
+    ALLOWED_IMAGE_EXTENSIONS: List[str] = ["jpg", "jpeg", "png", "webp"]
     UPLOAD_DIR: str = "uploads"
 
     # API Configuration
@@ -49,11 +51,16 @@ class Settings(BaseSettings):
     # AI Model Configuration
     SENTIMENT_MODEL: str = "distilbert-base-uncased-finetuned-sst-2-english"
     GEMINI_MODEL: str = "gemini-pro"  # Use gemini-pro instead of gemini-1.5-flash
+    GEMINI_MAX_CONCURRENCY: int = Field(8, ge=1)  # Max parallel Gemini Vision calls per process
+    ML_PATH_REFINEMENT_ENABLED: bool = True  # Let Gemini refine fallback paths when no street route is available
 
     # Routing API Configuration (optional)
     OPENROUTESERVICE_API_KEY: str = ""  # Optional, for OpenRouteService
     OSRM_SERVER_URL: str = "https://router.project-osrm.org"  # Public OSRM instance
 
+    # Gamification Configuration
+    RANK_RECALC_INTERVAL_SECONDS: int = 600  # Background leaderboard rank refresh
+
     # Database Query Limits
     MAX_ISSUES_LIMIT: int = 1000
     DEFAULT_ISSUES_LIMIT: int = 100
@@ -3,6 +3,7 @@ FastAPI dependencies for NeuraCity backend.
 Provides dependency injection for database clients and settings.
 """
 from supabase import Client
+from functools import lru_cache
 from app.core.config import Settings, get_settings
 from app.core.database import get_supabase_client, get_supabase_admin_client
 from app.services.supabase_service import SupabaseService
@@ -28,9 +29,11 @@ def get_admin_db() -> Client:
     return get_supabase_admin_client()
 
 
+@lru_cache()
 def get_supabase_service() -> SupabaseService:
     """
-    Dependency to get SupabaseService instance for database operations.
+    Dependency to get cached SupabaseService instance for database operations.
+    The service is stateless beyond its client, so one instance is shared.
 
     Returns:
         SupabaseService: SupabaseService instance
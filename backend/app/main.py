@@ -5,10 +5,12 @@ Main application file with all routes, middleware, and configuration.
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import os
+import orjson
 
 from app.core.config import get_settings
 from app.api.endpoints import issues, mood, traffic, noise, routing, admin, risk_index, users, accidents, risk
@@ -21,36 +23,78 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Settings values read once at import; the request paths below use these names
+_UPLOAD_DIR = settings.UPLOAD_DIR
+_VERSION = settings.VERSION
+_PROJECT_NAME = settings.PROJECT_NAME
+_API_V1_PREFIX = settings.API_V1_PREFIX
+_CORS_ORIGINS = tuple(settings.cors_origins_list)
+
+
+async def _periodic_recalculate_ranks():
+    """Refresh leaderboard ranks on a fixed interval instead of on every point award."""
+    from app.core.dependencies import get_supabase_service
+    from app.services.gamification_service import GamificationService
+    while True:
+        await asyncio.sleep(settings.RANK_RECALC_INTERVAL_SECONDS)
+        try:
+            await GamificationService(get_supabase_service()).recalculate_ranks()
+        except Exception as e:
+            logger.warning(f"Failed to recalculate user ranks: {e}")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     logger.info("Starting NeuraCity API...")
-    logger.info(f"Upload directory ready: {settings.UPLOAD_DIR}")
+    logger.info(f"Upload directory ready: {_UPLOAD_DIR}")
+    try:
+        from app.services.geocoding_service import open_cache as open_geocoding_cache
+        await asyncio.to_thread(open_geocoding_cache)
+    except Exception as e:
+        logger.warning(f"Failed to open geocoding cache: {e}")
+    background_tasks = [
+        asyncio.create_task(_periodic_recalculate_ranks()),
+    ]
 
     yield
 
     logger.info("Shutting down NeuraCity API...")
-    # Save geocoding cache before shutdown
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+
     try:
-        from app.services.geocoding_service import save_cache
-        save_cache()
-        logger.info("Geocoding cache saved")
+        from app.services.geocoding_service import aclose as close_geocoding_client
+        await close_geocoding_client()
     except Exception as e:
-        logger.warning(f"Failed to save geocoding cache on shutdown: {e}")
+        logger.warning(f"Failed to close geocoding client: {e}")
+
+    try:
+        from app.services.geocoding_service import close_cache as close_geocoding_cache
+        close_geocoding_cache()
+    except Exception as e:
+        logger.warning(f"Failed to close geocoding cache: {e}")
+
+    try:
+        from app.services.ml_routing_service import aclose as close_routing_client
+        await close_routing_client()
+    except Exception as e:
+        logger.warning(f"Failed to close routing client: {e}")
 
 
 app = FastAPI(
-    title=settings.PROJECT_NAME,
-    version=settings.VERSION,
+    title=_PROJECT_NAME,
+    version=_VERSION,
     description="Intelligent, Human-Centered Smart City Platform API",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.cors_origins_list,
+    allow_origins=list(_CORS_ORIGINS),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -61,14 +105,14 @@ app.add_middleware(
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler for uncaught exceptions."""
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "Internal server error"}
     )
 
 
-os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-app.mount(f"/{settings.UPLOAD_DIR}", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+os.makedirs(_UPLOAD_DIR, exist_ok=True)
+app.mount(f"/{_UPLOAD_DIR}", StaticFiles(directory=_UPLOAD_DIR), name="uploads")
 
 # Optionally serve frontend static files if they exist (for Railway deployment)
 # Try multiple possible paths for frontend dist
@@ -91,65 +135,75 @@ if frontend_dist:
     app.mount("/static", StaticFiles(directory=frontend_dist), name="frontend-static")
     
     logger.info(f"Serving frontend static files from {frontend_dist}")
+    _INDEX_PATH = os.path.join(frontend_dist, "index.html")
 else:
     logger.info("Frontend dist directory not found, serving API only")
 
 
+# Invariant payloads are encoded once at startup instead of on every request
+_API_INFO_RESPONSE = Response(
+    content=orjson.dumps({
+        "name": _PROJECT_NAME,
+        "version": _VERSION,
+        "status": "running",
+        "docs": "/docs"
+    }),
+    media_type="application/json"
+)
+_HEALTH_RESPONSE = Response(
+    content=orjson.dumps({"status": "healthy", "version": _VERSION}),
+    media_type="application/json"
+)
+
+
 @app.get("/")
 async def root():
     """Root endpoint - serves API info or frontend if available."""
     if frontend_dist:
         # If frontend exists, serve it
-        index_path = os.path.join(frontend_dist, "index.html")
-        if os.path.exists(index_path):
+        if os.path.exists(_INDEX_PATH):
             from fastapi.responses import FileResponse
-            return FileResponse(index_path)
+            return FileResponse(_INDEX_PATH)
     
     # Otherwise return API info
-    return {
-        "name": settings.PROJECT_NAME,
-        "version": settings.VERSION,
-        "status": "running",
-        "docs": "/docs"
-    }
+    return _API_INFO_RESPONSE
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "version": settings.VERSION}
+    return _HEALTH_RESPONSE
 
 
-app.include_router(issues.router, prefix=settings.API_V1_PREFIX)
-app.include_router(mood.router, prefix=settings.API_V1_PREFIX)
-app.include_router(traffic.router, prefix=settings.API_V1_PREFIX)
-app.include_router(noise.router, prefix=settings.API_V1_PREFIX)
-app.include_router(routing.router, prefix=settings.API_V1_PREFIX)
-app.include_router(admin.router, prefix=settings.API_V1_PREFIX)
-app.include_router(risk_index.router, prefix=settings.API_V1_PREFIX)
-app.include_router(users.router, prefix=settings.API_V1_PREFIX)
-app.include_router(accidents.router, prefix=settings.API_V1_PREFIX)
-app.include_router(risk.router, prefix=settings.API_V1_PREFIX)
+app.include_router(issues.router, prefix=_API_V1_PREFIX)
+app.include_router(mood.router, prefix=_API_V1_PREFIX)
+app.include_router(traffic.router, prefix=_API_V1_PREFIX)
+app.include_router(noise.router, prefix=_API_V1_PREFIX)
+app.include_router(routing.router, prefix=_API_V1_PREFIX)
+app.include_router(admin.router, prefix=_API_V1_PREFIX)
+app.include_router(risk_index.router, prefix=_API_V1_PREFIX)
+app.include_router(users.router, prefix=_API_V1_PREFIX)
+app.include_router(accidents.router, prefix=_API_V1_PREFIX)
+app.include_router(risk.router, prefix=_API_V1_PREFIX)
 
-logger.info(f"All routers loaded. API prefix: {settings.API_V1_PREFIX}")
+logger.info(f"All routers loaded. API prefix: {_API_V1_PREFIX}")
 
 # Catch-all route for SPA (must be last, after all API routes)
+# Paths the SPA must not shadow; a tuple lets startswith check them in one call
+_NON_SPA_PREFIXES = ("api/", "docs", "openapi.json", "health")
+
 if frontend_dist:
     @app.get("/{full_path:path}")
     async def serve_spa(full_path: str):
         """Serve frontend SPA for all non-API routes."""
         # Don't interfere with API routes, health, or docs
-        if (full_path.startswith("api/") or 
-            full_path.startswith("docs") or 
-            full_path.startswith("openapi.json") or
-            full_path == "health"):
+        if full_path.startswith(_NON_SPA_PREFIXES):
             from fastapi import HTTPException
             raise HTTPException(status_code=404, detail="Not found")
         
         # Serve index.html for SPA client-side routing
-        index_path = os.path.join(frontend_dist, "index.html")
-        if os.path.exists(index_path):
+        if os.path.exists(_INDEX_PATH):
             from fastapi.responses import FileResponse
-            return FileResponse(index_path)
+            return FileResponse(_INDEX_PATH)
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Frontend not found")
@@ -2,7 +2,7 @@
 Accident History Service
 Handles accident data aggregation, filtering, and hotspot identification.
 """
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from datetime import datetime
 import logging
 
@@ -49,16 +49,7 @@ class AccidentHistoryService:
             Dictionary with total count and paginated accident list
         """
         try:
-            # Build filters
-            filters = {
-                "issue_type": "accident",
-                "start_date": start_date,
-                "end_date": end_date,
-                "min_lat": min_lat,
-                "max_lat": max_lat,
-                "min_lng": min_lng,
-                "max_lng": max_lng
-            }
+            filters = self._build_filters(start_date, end_date, min_lat, max_lat, min_lng, max_lng)
 
             # Get total count
             total = await self.db.count_accidents(filters)
@@ -82,6 +73,85 @@ class AccidentHistoryService:
             logger.error(f"Error getting accident history: {e}", exc_info=True)
             raise
 
+    @staticmethod
+    def _build_filters(
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        min_lat: Optional[float],
+        max_lat: Optional[float],
+        min_lng: Optional[float],
+        max_lng: Optional[float]
+    ) -> Dict:
+        """Build the accident filter dict shared by history queries."""
+        return {
+            "issue_type": "accident",
+            "start_date": start_date,
+            "end_date": end_date,
+            "min_lat": min_lat,
+            "max_lat": max_lat,
+            "min_lng": min_lng,
+            "max_lng": max_lng
+        }
+
+    async def count_accident_history(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        min_lat: Optional[float] = None,
+        max_lat: Optional[float] = None,
+        min_lng: Optional[float] = None,
+        max_lng: Optional[float] = None
+    ) -> int:
+        """Count accidents matching the history filters."""
+        filters = self._build_filters(start_date, end_date, min_lat, max_lat, min_lng, max_lng)
+        return await self.db.count_accidents(filters)
+
+    async def get_accident_history_iter(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        min_lat: Optional[float] = None,
+        max_lat: Optional[float] = None,
+        min_lng: Optional[float] = None,
+        max_lng: Optional[float] = None,
+        page: int = 1,
+        page_size: int = 20,
+        chunk_size: int = 100
+    ) -> AsyncIterator[Dict]:
+        """
+        Yield accidents for one page, fetched in range-paginated chunks.
+
+        Same filters and ordering as get_accident_history, but rows are
+        yielded as each chunk arrives so the full page is never held in memory.
+
+        Args:
+            start_date: Filter accidents after this date
+            end_date: Filter accidents before this date
+            min_lat: Minimum latitude for bounding box
+            max_lat: Maximum latitude for bounding box
+            min_lng: Minimum longitude for bounding box
+            max_lng: Maximum longitude for bounding box
+            page: Page number (1-indexed)
+            page_size: Number of results per page
+            chunk_size: Rows fetched per database round-trip
+
+        Yields:
+            Accident records, most recent first
+        """
+        filters = self._build_filters(start_date, end_date, min_lat, max_lat, min_lng, max_lng)
+        offset = (page - 1) * page_size
+        remaining = page_size
+
+        while remaining > 0:
+            limit = min(chunk_size, remaining)
+            rows = await self.db.get_accidents_filtered(filters=filters, limit=limit, offset=offset)
+            for row in rows:
+                yield row
+            if len(rows) < limit:
+                break
+            offset += limit
+            remaining -= limit
+
     async def get_accident_hotspots(
         self,
         min_accidents: int = 2,
@@ -129,20 +199,8 @@ class AccidentHistoryService:
             Dictionary with accident statistics
         """
         try:
-            stats = await self.db.get_accident_stats(
-                start_date=start_date,
-                end_date=end_date
-            )
-
-            return {
-                "total_accidents": stats.get("total", 0),
-                "avg_severity": stats.get("avg_severity", 0.0),
-                "avg_urgency": stats.get("avg_urgency", 0.0),
-                "critical_count": stats.get("critical_count", 0),
-                "high_count": stats.get("high_count", 0),
-                "resolved_count": stats.get("resolved_count", 0),
-                "open_count": stats.get("open_count", 0)
-            }
+            dashboard = await self.get_dashboard(start_date=start_date, end_date=end_date, sections=("stats",))
+            return dashboard["statistics"]
 
         except Exception as e:
             logger.error(f"Error getting accident statistics: {e}", exc_info=True)
@@ -185,16 +243,63 @@ class AccidentHistoryService:
             Dictionary with daily accident counts and trends
         """
         try:
-            trends = await self.db.get_accident_trends(days=days)
+            dashboard = await self.get_dashboard(days=days, sections=("trends",))
+            return dashboard["trends"]
+
+        except Exception as e:
+            logger.error(f"Error getting accident trends: {e}", exc_info=True)
+            raise
+
+    async def get_dashboard(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        days: int = 30,
+        sections: Tuple[str, ...] = ("stats", "trends")
+    ) -> Dict:
+        """
+        Get accident statistics and trends from a single database scan.
+
+        Args:
+            start_date: Start date for statistics
+            end_date: End date for statistics
+            days: Number of days to analyze for trends
+            sections: Which of "stats" and "trends" to compute; sections left
+                out are not aggregated and come back zeroed
+
+        Returns:
+            Dictionary with "statistics" and "trends" sections
+        """
+        try:
+            dashboard = await self.db.get_accident_dashboard(
+                start_date=start_date,
+                end_date=end_date,
+                days=days,
+                sections=sections
+            )
+            stats = dashboard.get("stats") or {}
+            trends = dashboard.get("trends") or {}
+            total_in_period = trends.get("total", 0)
 
             return {
-                "period_days": days,
-                "daily_counts": trends.get("daily_counts", []),
-                "total_in_period": trends.get("total", 0),
-                "avg_per_day": trends.get("avg_per_day", 0.0),
-                "trend_direction": trends.get("trend_direction", "stable")  # increasing, decreasing, stable
+                "statistics": {
+                    "total_accidents": stats.get("total", 0),
+                    "avg_severity": stats.get("avg_severity", 0.0),
+                    "avg_urgency": stats.get("avg_urgency", 0.0),
+                    "critical_count": stats.get("critical_count", 0),
+                    "high_count": stats.get("high_count", 0),
+                    "resolved_count": stats.get("resolved_count", 0),
+                    "open_count": stats.get("open_count", 0)
+                },
+                "trends": {
+                    "period_days": days,
+                    "daily_counts": trends.get("daily_counts", []),
+                    "total_in_period": total_in_period,
+                    "avg_per_day": round(total_in_period / days, 2) if days > 0 else 0.0,
+                    "trend_direction": "stable"  # increasing, decreasing, stable
+                }
             }
 
         except Exception as e:
-            logger.error(f"Error getting accident trends: {e}", exc_info=True)
+            logger.error(f"Error getting accident dashboard: {e}", exc_info=True)
             raise
@@ -1,15 +1,29 @@
 """Action engine for processing new issues and triggering AI actions."""
 from app.services.supabase_service import SupabaseService
 from app.services.gemini_service import generate_emergency_summary, generate_work_order_suggestion, analyze_issue_image
-from app.core.database import get_supabase_client
+from app.core.dependencies import get_supabase_service
 from app.core.config import get_settings
 import logging
 from typing import Dict, Any
+import asyncio
 import os
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Bounds concurrent Gemini Vision calls so bursts of work orders can't exhaust the quota
+_GEMINI_SEM = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+
+# Upload directory resolved once at import instead of per work order
+_UPLOAD_DIR = os.path.abspath(settings.UPLOAD_DIR)
+
+
+def _resolve_image_path(image_url: str) -> str:
+    """Map a stored image URL (e.g. "uploads/issue_abc.jpg") to its absolute file path."""
+    if os.path.isabs(image_url):
+        return image_url
+    return os.path.join(_UPLOAD_DIR, image_url.rpartition('/')[2])
+
 
 async def process_new_issue(issue_id: str, issue_data: Dict[str, Any]):
     """
@@ -24,16 +38,17 @@ async def process_new_issue(issue_id: str, issue_data: Dict[str, Any]):
     
     logger.info(f"Processing issue {issue_id} with action type: {action_type}")
     
+    if action_type not in ("emergency", "work_order"):
+        logger.info(f"Issue {issue_id} set to monitor mode, no action needed")
+        return
+    
     try:
-        client = get_supabase_client()
-        db_service = SupabaseService(client)
+        db_service = get_supabase_service()
         
         if action_type == "emergency":
             await create_emergency_entry(db_service, issue_id, issue_data)
-        elif action_type == "work_order":
-            await create_work_order_entry(db_service, issue_id, issue_data)
         else:
-            logger.info(f"Issue {issue_id} set to monitor mode, no action needed")
+            await create_work_order_entry(db_service, issue_id, issue_data)
     
     except Exception as e:
         logger.error(f"Error processing issue {issue_id}: {e}")
@@ -64,20 +79,15 @@ async def create_work_order_entry(db_service: SupabaseService, issue_id: str, is
         # Try vision analysis if image is available
         image_url = issue_data.get('image_url')
         if image_url:
-            # Convert relative URL to absolute path
-            if os.path.isabs(image_url):
-                image_path = image_url
-            else:
-                # Extract filename and construct absolute path
-                filename = os.path.basename(image_url)
-                image_path = os.path.abspath(os.path.join(settings.UPLOAD_DIR, filename))
+            image_path = _resolve_image_path(image_url)
             if os.path.exists(image_path):
                 logger.info(f"Analyzing image with Gemini Vision: {image_path}")
-                suggestions = await analyze_issue_image(
-                    image_path=image_path,
-                    issue_type=issue_data.get('issue_type', 'unknown'),
-                    description=issue_data.get('description', '')
-                )
+                async with _GEMINI_SEM:
+                    suggestions = await analyze_issue_image(
+                        image_path=image_path,
+                        issue_type=issue_data.get('issue_type', 'unknown'),
+                        description=issue_data.get('description', '')
+                    )
             else:
                 logger.warning(f"Image path not found: {image_path}, falling back to text-based analysis")
                 suggestions = await generate_work_order_suggestion(issue_data)
@@ -2,8 +2,11 @@
 Gamification Service
 Handles point calculation, awarding, and rank management.
 """
-from typing import Optional, Dict
+from typing import Optional, Dict, List
+import asyncio
 import logging
+import numpy as np
+from app.utils.validators import validate_uuid
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +18,39 @@ POINTS_CONFIG = {
     "bonus": 0  # Variable, specified when awarded
 }
 
+VALID_ACTIONS = frozenset(POINTS_CONFIG)
+
+# Issue scoring constants, hoisted out of the per-issue path
+ISSUE_REPORT_BASE_POINTS = POINTS_CONFIG["issue_reported"]
+ISSUE_TYPE_BONUS = {"accident": 10}  # Additional bonus for critical issue types
+
+
+def _build_history_record(
+    user_id: str,
+    action_type: str,
+    issue_id: Optional[str],
+    description: Optional[str],
+    custom_points: Optional[int]
+) -> Optional[Dict]:
+    """Build the points history row for one award, or None for an unknown action."""
+    if custom_points is not None:
+        points = custom_points
+    elif action_type in VALID_ACTIONS:
+        points = POINTS_CONFIG[action_type]
+    else:
+        return None
+
+    if points == 0 and action_type != "bonus":
+        return None
+
+    return {
+        "user_id": user_id,
+        "points": points,
+        "action_type": action_type,
+        "issue_id": issue_id,
+        "description": description or f"{action_type.replace('_', ' ').title()}"
+    }
+
 
 class GamificationService:
     """Service for gamification logic."""
@@ -49,70 +85,137 @@ class GamificationService:
         Returns:
             Updated user record with new point total
         """
-        try:
-            # Determine points to award
-            if custom_points is not None:
-                points = custom_points
-            else:
-                points = POINTS_CONFIG.get(action_type, 0)
+        # Reject malformed requests before any database round trip
+        if not validate_uuid(user_id):
+            logger.warning(f"Invalid user_id: {user_id}, no points awarded")
+            return None
 
-            if points == 0 and action_type != "bonus":
+        try:
+            history_data = _build_history_record(user_id, action_type, issue_id, description, custom_points)
+            if history_data is None:
                 logger.warning(f"Unknown action_type: {action_type}, no points awarded")
                 return None
-
-            # Create points history record
-            history_data = {
-                "user_id": user_id,
-                "points": points,
-                "action_type": action_type,
-                "issue_id": issue_id,
-                "description": description or f"{action_type.replace('_', ' ').title()}"
-            }
-            await self.db.create_points_history(history_data)
-
-            # Update user's total points and action counts
-            user = await self.db.get_user_by_id(user_id)
-            if not user:
+            points = history_data["points"]
+
+            # History insert and counter increment are independent, so issue them together.
+            # The increment happens in SQL, so concurrent awards can't lose updates.
+            _, updated_user = await asyncio.gather(
+                self.db.create_points_history(history_data),
+                self.db.increment_user_counters(
+                    user_id,
+                    points,
+                    reported_delta=1 if action_type == "issue_reported" else 0,
+                    verified_delta=1 if action_type == "issue_verified" else 0
+                )
+            )
+
+            if not updated_user:
                 logger.error(f"User {user_id} not found when awarding points")
                 return None
 
-            update_data = {
-                "total_points": user["total_points"] + points
-            }
+            new_points = updated_user["total_points"]
+            await self.update_ranks_incremental(user_id, new_points - points, new_points)
 
-            # Increment specific counters
-            if action_type == "issue_reported":
-                update_data["issues_reported"] = user["issues_reported"] + 1
-            elif action_type == "issue_verified":
-                update_data["issues_verified"] = user["issues_verified"] + 1
+            logger.info(f"Awarded {points} points to user {user_id} for {action_type}")
+            return updated_user
 
-            # Update user
-            updated_user = await self.db.update_user(user_id, update_data)
+        except Exception as e:
+            logger.error(f"Error awarding points: {e}", exc_info=True)
+            raise
+
+    async def award_points_bulk(self, events: List[Dict]) -> int:
+        """
+        Award points for many actions at once (backfills, replays).
+        History rows are inserted in chunks, counters are incremented once per
+        user, and ranks are rebuilt a single time at the end.
+
+        Args:
+            events: Dicts with the award_points arguments
+                (user_id, action_type, and optionally issue_id, description, custom_points)
 
-            # Recalculate ranks for all users
+        Returns:
+            Number of events that awarded points
+        """
+        try:
+            records = []
+            totals: Dict[str, List[int]] = {}
+            for event in events:
+                if not validate_uuid(event["user_id"]):
+                    logger.warning(f"Invalid user_id: {event['user_id']}, no points awarded")
+                    continue
+                record = _build_history_record(
+                    event["user_id"],
+                    event["action_type"],
+                    event.get("issue_id"),
+                    event.get("description"),
+                    event.get("custom_points")
+                )
+                if record is None:
+                    logger.warning(f"Unknown action_type: {event['action_type']}, no points awarded")
+                    continue
+                records.append(record)
+
+                # [points, reported, verified] per user
+                user_totals = totals.setdefault(record["user_id"], [0, 0, 0])
+                user_totals[0] += record["points"]
+                user_totals[1] += record["action_type"] == "issue_reported"
+                user_totals[2] += record["action_type"] == "issue_verified"
+
+            if not records:
+                return 0
+
+            await self.db.create_points_history_bulk(records)
+            await asyncio.gather(*(
+                self.db.increment_user_counters(
+                    user_id,
+                    points,
+                    reported_delta=reported,
+                    verified_delta=verified
+                )
+                for user_id, (points, reported, verified) in totals.items()
+            ))
             await self.recalculate_ranks()
 
-            logger.info(f"Awarded {points} points to user {user_id} for {action_type}")
-            return updated_user
+            logger.info(f"Awarded points for {len(records)} actions across {len(totals)} users")
+            return len(records)
 
         except Exception as e:
-            logger.error(f"Error awarding points: {e}", exc_info=True)
+            logger.error(f"Error awarding points in bulk: {e}", exc_info=True)
             raise
 
+    async def update_ranks_incremental(self, user_id: str, old_points: int, new_points: int) -> Optional[int]:
+        """
+        Adjust ranks after one user's points change.
+        Only users whose position the change crosses are moved; if no neighbor
+        is crossed nothing is written.
+
+        Args:
+            user_id: User whose points changed
+            old_points: Total points before the change
+            new_points: Total points after the change
+
+        Returns:
+            The user's new rank, or None if the user is not ranked yet
+        """
+        try:
+            return await self.db.update_user_rank_incremental(user_id, old_points, new_points)
+        except Exception as e:
+            # The periodic full rebuild corrects any ranks missed here
+            logger.warning(f"Incremental rank update failed for user {user_id}: {e}")
+            return None
+
     async def recalculate_ranks(self):
         """
         Recalculate ranks for all users based on total points.
         Users with higher points get lower rank numbers (1 = best).
+        Runs periodically in the background to correct drift from
+        incremental updates, so ranks are eventually consistent.
         """
         try:
-            # Get all users sorted by points (descending) and created_at (ascending for tiebreaker)
-            users = await self.db.get_all_users_for_ranking()
+            # Ranks are rebuilt server-side into user_rank_rankings (points desc, created_at asc)
+            changed = await self.db.refresh_user_rankings()
 
-            # Assign ranks
-            for rank, user in enumerate(users, start=1):
-                await self.db.update_user(user["id"], {"rank": rank})
-
-            logger.info(f"Recalculated ranks for {len(users)} users")
+            logger.info(f"Recalculated ranks, {changed} changed")
 
         except Exception as e:
             logger.error(f"Error recalculating ranks: {e}", exc_info=True)
@@ -136,20 +239,42 @@ class GamificationService:
         Returns:
             Bonus points to award (in addition to base report points)
         """
-        base_points = POINTS_CONFIG["issue_reported"]
-
-        # Calculate bonus based on severity and urgency
+        # Award up to 50% bonus for high severity/urgency issues
         avg_score = (severity + urgency) / 2
+        bonus_points = int(ISSUE_REPORT_BASE_POINTS * (avg_score * 0.5))
 
-        # Award up to 50% bonus for high severity/urgency issues
-        bonus_multiplier = avg_score * 0.5
-        bonus_points = int(base_points * bonus_multiplier)
+        return ISSUE_REPORT_BASE_POINTS + bonus_points + ISSUE_TYPE_BONUS.get(issue_type, 0)
+
+    def calculate_points_batch(
+        self,
+        issue_types: np.ndarray,
+        severity: np.ndarray,
+        urgency: np.ndarray
+    ) -> np.ndarray:
+        """
+        Vectorized calculate_points_for_issue for many issues at once
+        (seeding, replays). Produces the same values as the scalar path.
+
+        Args:
+            issue_types: Array of issue type strings
+            severity: Array of severity scores (0-1)
+            urgency: Array of urgency scores (0-1)
 
-        # Additional bonus for critical issue types
-        if issue_type == "accident":
-            bonus_points += 10
+        Returns:
+            Integer array of points per issue
+        """
+        severity = np.asarray(severity, dtype=np.float64)
+        urgency = np.asarray(urgency, dtype=np.float64)
+        issue_types = np.asarray(issue_types)
+
+        avg_score = (severity + urgency) / 2
+        bonus_points = np.trunc(ISSUE_REPORT_BASE_POINTS * (avg_score * 0.5)).astype(np.int64)
+
+        type_bonus = np.zeros(issue_types.shape, dtype=np.int64)
+        for issue_type, bonus in ISSUE_TYPE_BONUS.items():
+            type_bonus[issue_types == issue_type] += bonus
 
-        return base_points + bonus_points
+        return ISSUE_REPORT_BASE_POINTS + bonus_points + type_bonus
 
     async def get_user_rank_percentile(self, user_id: str) -> Optional[float]:
         """
@@ -159,20 +284,21 @@ class GamificationService:
             user_id: User ID
 
         Returns:
-            Percentile score or None if user not found
+            Percentile score or None if user not found or not yet ranked
         """
         try:
-            user = await self.db.get_user_by_id(user_id)
-            if not user:
+            # Rank is materialized and the user count is cached, so no COUNT runs here
+            user, total_users = await asyncio.gather(
+                self.db.get_user_by_id(user_id),
+                self.db.get_total_user_count()
+            )
+            if not user or not user.get("rank"):
                 return None
 
-            total_users = await self.db.get_total_user_count()
-            if total_users == 0:
-                return 0.0
-
-            # Calculate percentile (higher rank number = lower percentile)
-            percentile = ((total_users - user["rank"] + 1) / total_users) * 100
-            return round(percentile, 2)
+            rank = user["rank"]
+            # The count may be a planner estimate; never let it fall below the rank
+            total_users = max(total_users, rank)
+            return round((total_users - rank + 1) / total_users * 100, 2)
 
         except Exception as e:
             logger.error(f"Error calculating percentile: {e}", exc_info=True)
@@ -1,8 +1,13 @@
 """Gemini AI service for emergency summaries and work order suggestions."""
 import google.generativeai as genai
 from app.core.config import get_settings
+from app.utils.cache import ISSUE_IMAGE_CACHE, WORK_ORDER_SUGGESTION_CACHE
+from hashlib import blake2b
 import logging
 from typing import Dict, Any, Optional, List
+import asyncio
+import io
+import re
 import time
 from PIL import Image
 import os
@@ -13,14 +18,133 @@ settings = get_settings()
 # Initialize Gemini
 try:
     genai.configure(api_key=settings.GEMINI_API_KEY)
+    # One client serves text and vision tasks (gemini-pro supports vision)
     model = genai.GenerativeModel(settings.GEMINI_MODEL)
-    # Use same model for vision tasks (gemini-pro supports vision)
-    vision_model = genai.GenerativeModel(settings.GEMINI_MODEL)
     logger.info("Gemini API initialized")
 except Exception as e:
     logger.error(f"Failed to initialize Gemini: {e}")
     model = None
-    vision_model = None
+
+
+# Response parsing: one scan picks up every "FIELD: value" line
+FIELD_RE = re.compile(r'^[ \t]*(MATERIALS|SPECIALTY|SEVERITY|NOTES|SAFETY):[ \t]*(.*?)[ \t]*\r?$', re.MULTILINE)
+VALID_SPECIALTIES = frozenset({'pothole_repair', 'electrical', 'traffic_signal', 'general_contractor'})
+VALID_SEVERITIES = frozenset({'minor', 'moderate', 'severe', 'critical'})
+
+# Longest image side sent to Gemini Vision
+MAX_IMAGE_DIMENSION = 1024
+
+# Micro-batching for text prompts
+BATCH_WINDOW_SECONDS = 0.05
+MAX_BATCH_SIZE = 16
+
+
+# Invariant instruction blocks, built once at import; only the issue fields vary per call
+IMAGE_ANALYSIS_PREAMBLE = """You are an infrastructure damage assessment expert. Analyze the attached image of the issue described below.
+
+Please provide a detailed assessment:
+
+1. **MATERIALS NEEDED**: List specific materials and quantities for repair (be precise, e.g., "50 lbs cold patch asphalt", "2 bags Portland cement")
+
+2. **CONTRACTOR SPECIALTY**: Choose ONE from: pothole_repair, electrical, traffic_signal, general_contractor
+
+3. **SEVERITY**: Rate as: minor, moderate, severe, critical
+
+4. **REPAIR NOTES**: Specific instructions for the contractor (2-3 sentences)
+
+5. **SAFETY CONCERNS**: Any immediate safety hazards
+
+Format your response EXACTLY as:
+MATERIALS: [item1, item2, item3]
+SPECIALTY: [specialty]
+SEVERITY: [severity]
+NOTES: [detailed notes]
+SAFETY: [safety concerns or "None"]
+"""
+
+_EMERGENCY_SUMMARY_PROMPT = """Generate a brief, dispatcher-ready emergency summary for the following accident report:
+
+Location: {lat}, {lng}
+Type: {issue_type}
+Description: {description}
+
+Provide a concise summary (2-3 sentences) that includes:
+1. What happened
+2. Severity assessment
+3. Recommended emergency response
+
+Keep it professional and actionable for emergency dispatchers."""
+
+
+class _PromptBatcher:
+    """
+    Collects text prompts for a short window and sends each batch concurrently.
+    Identical prompts arriving in the same window share a single Gemini call.
+    """
+
+    def __init__(self, window: float = BATCH_WINDOW_SECONDS, max_batch: int = MAX_BATCH_SIZE):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dispatches = set()
+
+    async def submit(self, prompt: str):
+        """Queue a prompt and wait for its Gemini response."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._collect())
+
+        future = loop.create_future()
+        await self._queue.put((prompt, future))
+        return await future
+
+    async def _collect(self):
+        """Group queued prompts into batches of up to max_batch within the window."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Dispatch in the background so the next window starts collecting immediately
+            task = loop.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[tuple]):
+        """Send each distinct prompt once and fan results back out to waiting callers."""
+        waiters: Dict[str, List[asyncio.Future]] = {}
+        for prompt, future in batch:
+            waiters.setdefault(prompt, []).append(future)
+
+        prompts = list(waiters)
+        results = await asyncio.gather(
+            *[asyncio.to_thread(model.generate_content, prompt) for prompt in prompts],
+            return_exceptions=True
+        )
+
+        for prompt, result in zip(prompts, results):
+            for future in waiters[prompt]:
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+_prompt_batcher = _PromptBatcher()
 
 
 async def generate_emergency_summary(issue: Dict[str, Any]) -> str:
@@ -37,20 +161,14 @@ async def generate_emergency_summary(issue: Dict[str, Any]) -> str:
         return "Emergency summary unavailable - AI service not configured."
     
     try:
-        prompt = f"""Generate a brief, dispatcher-ready emergency summary for the following accident report:
-
-Location: {issue.get('lat', 'unknown')}, {issue.get('lng', 'unknown')}
-Type: {issue.get('issue_type', 'accident')}
-Description: {issue.get('description', 'No description provided')}
-
-Provide a concise summary (2-3 sentences) that includes:
-1. What happened
-2. Severity assessment
-3. Recommended emergency response
-
-Keep it professional and actionable for emergency dispatchers."""
+        prompt = _EMERGENCY_SUMMARY_PROMPT.format(
+            lat=issue.get('lat', 'unknown'),
+            lng=issue.get('lng', 'unknown'),
+            issue_type=issue.get('issue_type', 'accident'),
+            description=issue.get('description', 'No description provided')
+        )
 
-        response = model.generate_content(prompt)
+        response = await _prompt_batcher.submit(prompt)
         summary = response.text.strip()
         logger.info("Generated emergency summary")
         return summary
@@ -59,6 +177,34 @@ Keep it professional and actionable for emergency dispatchers."""
         return f"Error generating summary. Issue type: {issue.get('issue_type')}. Location: ({issue.get('lat')}, {issue.get('lng')})"
 
 
+def _load_image(image_path: str) -> bytes:
+    """
+    Open, verify and decode an image, downscaled for Gemini Vision and
+    encoded as JPEG. Blocking; run in a worker thread.
+    """
+    img = Image.open(image_path)
+    # Verify the image is valid by attempting to load it
+    img.verify()
+    # Re-open after verify (verify closes the file)
+    img = Image.open(image_path)
+    # Phone photos are far larger than the model needs; send at most 1024px per side
+    img.draft("RGB", (MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION))
+    img.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    img.convert("RGB").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+async def _get_image_payload(image_path: str) -> Dict[str, Any]:
+    """Downscaled image blob for Gemini, reused while the file is unchanged."""
+    cache_key = (image_path, os.path.getmtime(image_path))
+    data = ISSUE_IMAGE_CACHE.get(cache_key)
+    if data is None:
+        data = await asyncio.to_thread(_load_image, image_path)
+        ISSUE_IMAGE_CACHE[cache_key] = data
+    return {"mime_type": "image/jpeg", "data": data}
+
+
 async def analyze_issue_image(image_path: str, issue_type: str, description: str = "") -> Dict[str, Any]:
     """
     Analyze issue image using Gemini Vision to determine materials and severity.
@@ -71,7 +217,7 @@ async def analyze_issue_image(image_path: str, issue_type: str, description: str
     Returns:
         dict: {'materials': List[str], 'specialty': str, 'notes': str, 'severity_assessment': str}
     """
-    if not vision_model:
+    if not model:
         return {
             "materials": ["Standard repair materials"],
             "specialty": "general_contractor",
@@ -86,11 +232,7 @@ async def analyze_issue_image(image_path: str, issue_type: str, description: str
             return await generate_work_order_suggestion({"issue_type": issue_type, "description": description})
 
         try:
-            img = Image.open(image_path)
-            # Verify the image is valid by attempting to load it
-            img.verify()
-            # Re-open after verify (verify closes the file)
-            img = Image.open(image_path)
+            img = await _get_image_payload(image_path)
         except (IOError, OSError) as e:
             logger.error(f"Failed to open or verify image {image_path}: {e}")
             return await generate_work_order_suggestion({"issue_type": issue_type, "description": description})
@@ -98,61 +240,28 @@ async def analyze_issue_image(image_path: str, issue_type: str, description: str
             logger.error(f"Unexpected error loading image {image_path}: {e}")
             return await generate_work_order_suggestion({"issue_type": issue_type, "description": description})
         
-        prompt = f"""You are an infrastructure damage assessment expert. Analyze this image of a {issue_type}.
-
-Description: {description or 'No description provided'}
-
-Please provide a detailed assessment:
-
-1. **MATERIALS NEEDED**: List specific materials and quantities for repair (be precise, e.g., "50 lbs cold patch asphalt", "2 bags Portland cement")
+        request = f"Issue Type: {issue_type}\nDescription: {description or 'No description provided'}"
 
-2. **CONTRACTOR SPECIALTY**: Choose ONE from: pothole_repair, electrical, traffic_signal, general_contractor
-
-3. **SEVERITY**: Rate as: minor, moderate, severe, critical
-
-4. **REPAIR NOTES**: Specific instructions for the contractor (2-3 sentences)
-
-5. **SAFETY CONCERNS**: Any immediate safety hazards
-
-Format your response EXACTLY as:
-MATERIALS: [item1, item2, item3]
-SPECIALTY: [specialty]
-SEVERITY: [severity]
-NOTES: [detailed notes]
-SAFETY: [safety concerns or "None"]
-"""
-
-        response = vision_model.generate_content([prompt, img])
+        response = await asyncio.to_thread(model.generate_content, [IMAGE_ANALYSIS_PREAMBLE, request, img])
         text = response.text.strip()
         
         # Parse response
-        materials = ["Standard repair materials"]
-        specialty = "general_contractor"
-        severity = "moderate"
-        notes = "See issue details"
-        safety = "None"
+        fields = dict(FIELD_RE.findall(text))
         
-        for line in text.split('\n'):
-            line = line.strip()
-            if line.startswith('MATERIALS:'):
-                materials_str = line.replace('MATERIALS:', '').strip()
-                # Parse materials list
-                materials = [m.strip() for m in materials_str.strip('[]').split(',') if m.strip()]
-                if not materials:
-                    materials = ["Standard materials"]
-            elif line.startswith('SPECIALTY:'):
-                specialty = line.replace('SPECIALTY:', '').strip().lower()
-            elif line.startswith('SEVERITY:'):
-                severity = line.replace('SEVERITY:', '').strip().lower()
-            elif line.startswith('NOTES:'):
-                notes = line.replace('NOTES:', '').strip()
-            elif line.startswith('SAFETY:'):
-                safety = line.replace('SAFETY:', '').strip()
+        materials = ["Standard repair materials"]
+        if 'MATERIALS' in fields:
+            materials = [m.strip() for m in fields['MATERIALS'].strip('[]').split(',') if m.strip()]
+            if not materials:
+                materials = ["Standard materials"]
+        specialty = fields.get('SPECIALTY', 'general_contractor').lower()
+        severity = fields.get('SEVERITY', 'moderate').lower()
+        notes = fields.get('NOTES', 'See issue details')
+        safety = fields.get('SAFETY', 'None')
         
-        if specialty not in ['pothole_repair', 'electrical', 'traffic_signal', 'general_contractor']:
+        if specialty not in VALID_SPECIALTIES:
             specialty = 'general_contractor'
         
-        if severity not in ['minor', 'moderate', 'severe', 'critical']:
+        if severity not in VALID_SEVERITIES:
             severity = 'moderate'
         
         logger.info(f"Analyzed image for {issue_type}: {severity} severity, {len(materials)} materials")
@@ -168,6 +277,113 @@ SAFETY: [safety concerns or "None"]
         return await generate_work_order_suggestion({"issue_type": issue_type, "description": description})
 
 
+# Contextual questions per canonical issue type
+_CONTEXTUAL_QUESTIONS = {
+    "pothole": (
+        "What is the approximate size/diameter of the pothole?",
+        "Is it on a main road or side street?",
+        "Are there any exposed rebar or deep cracks?",
+        "What is the surrounding road condition?"
+    ),
+    "traffic_light": (
+        "Is the light completely out or flashing?",
+        "Which direction(s) are affected?",
+        "Is it a single light or multiple lights?",
+        "Are there any visible wiring issues?"
+    ),
+    "accident": (
+        "Are there any injuries?",
+        "Is there vehicle damage blocking traffic?",
+        "Are emergency services already on scene?",
+        "What is the extent of property damage?"
+    ),
+    "_default": (
+        "What is the specific nature of the issue?",
+        "What is the extent of the damage?",
+        "Are there any safety concerns?",
+        "What materials or expertise might be needed?"
+    ),
+}
+
+_WORK_ORDER_PROMPT = """You are an infrastructure repair expert. Analyze this issue and provide detailed work order information.
+
+Issue Type: {issue_type}
+Description: {description}
+
+Based on the issue type, consider these questions:
+<questions>
+
+Please provide:
+1. **MATERIALS NEEDED**: List specific materials with quantities (e.g., "50 lbs cold patch asphalt", "2 traffic signal bulbs", "10 sq ft concrete")
+2. **CONTRACTOR SPECIALTY**: Choose ONE from: pothole_repair, electrical, traffic_signal, general_contractor
+3. **REPAIR NOTES**: Detailed instructions for the contractor (2-3 sentences with specific steps)
+
+Format your response EXACTLY as:
+MATERIALS: [item1, item2, item3]
+SPECIALTY: [specialty]
+NOTES: [detailed notes]"""
+
+# Work order prompts rendered once per canonical type; only issue_type/description vary per call
+PROMPT_TEMPLATES = {
+    canonical: _WORK_ORDER_PROMPT.replace("<questions>", "\n".join(f"- {q}" for q in questions))
+    for canonical, questions in _CONTEXTUAL_QUESTIONS.items()
+}
+
+SPECIALTY_BY_TYPE = {
+    "pothole": "pothole_repair",
+    "traffic_light": "traffic_signal",
+    "accident": "general_contractor",
+    "other": "general_contractor",
+}
+
+DEFAULT_MATERIALS_BY_TYPE = {
+    "pothole": ("Cold patch asphalt (50-100 lbs)", "Road base material", "Compaction equipment"),
+    "traffic_light": ("Traffic signal bulbs", "Electrical wiring", "Signal controller components"),
+}
+
+
+def _canonical_issue_type(issue_type: str) -> str:
+    """Map a (possibly free-form) issue type onto a PROMPT_TEMPLATES key."""
+    if issue_type in PROMPT_TEMPLATES:
+        return issue_type
+    if 'pothole' in issue_type:
+        return 'pothole'
+    if 'traffic_light' in issue_type or 'signal' in issue_type:
+        return 'traffic_light'
+    if 'accident' in issue_type:
+        return 'accident'
+    return '_default'
+
+
+def _default_materials(issue_type: str) -> Optional[tuple]:
+    """
+    Default materials when Gemini lists none. Matched on the type name only,
+    so e.g. "signal" issues get traffic-light questions but not these defaults.
+    """
+    if 'pothole' in issue_type:
+        return DEFAULT_MATERIALS_BY_TYPE['pothole']
+    if 'traffic_light' in issue_type:
+        return DEFAULT_MATERIALS_BY_TYPE['traffic_light']
+    return None
+
+
+def _specialty_from_keywords(issue_type: str) -> str:
+    """Infer contractor specialty for issue types not in SPECIALTY_BY_TYPE."""
+    if 'pothole' in issue_type:
+        return 'pothole_repair'
+    if 'traffic' in issue_type or 'signal' in issue_type or 'light' in issue_type:
+        return 'traffic_signal'
+    if 'electrical' in issue_type or 'power' in issue_type:
+        return 'electrical'
+    return 'general_contractor'
+
+
+def _suggestion_cache_key(issue_type: str, description: str) -> str:
+    """Content-addressed key: issue type plus case/whitespace-normalized description."""
+    normalized = " ".join(description.lower().split())
+    return blake2b(f"{issue_type}|{normalized}".encode(), digest_size=16).hexdigest()
+
+
 async def generate_work_order_suggestion(issue: Dict[str, Any]) -> Dict[str, Any]:
     """
     Generate work order suggestions including materials and contractor specialty.
@@ -190,107 +406,48 @@ async def generate_work_order_suggestion(issue: Dict[str, Any]) -> Dict[str, Any
         issue_type = issue.get('issue_type', 'unknown').lower()
         description = issue.get('description', '')
         
-        # Build contextual questions based on issue type
-        contextual_questions = []
+        # Repeated issue type + description pairs reuse the earlier suggestion
+        cache_key = _suggestion_cache_key(issue_type, description or '')
+        cached = WORK_ORDER_SUGGESTION_CACHE.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Work order suggestion cache hit for {issue_type}")
+            return {**cached, "materials": list(cached["materials"])}
         
-        if issue_type == 'pothole' or 'pothole' in issue_type:
-            contextual_questions = [
-                "What is the approximate size/diameter of the pothole?",
-                "Is it on a main road or side street?",
-                "Are there any exposed rebar or deep cracks?",
-                "What is the surrounding road condition?"
-            ]
-        elif issue_type == 'traffic_light' or 'traffic_light' in issue_type or 'signal' in issue_type:
-            contextual_questions = [
-                "Is the light completely out or flashing?",
-                "Which direction(s) are affected?",
-                "Is it a single light or multiple lights?",
-                "Are there any visible wiring issues?"
-            ]
-        elif issue_type == 'accident' or 'accident' in issue_type:
-            contextual_questions = [
-                "Are there any injuries?",
-                "Is there vehicle damage blocking traffic?",
-                "Are emergency services already on scene?",
-                "What is the extent of property damage?"
-            ]
-        else:
-            contextual_questions = [
-                "What is the specific nature of the issue?",
-                "What is the extent of the damage?",
-                "Are there any safety concerns?",
-                "What materials or expertise might be needed?"
-            ]
-        
-        # Build enhanced prompt with contextual questions
-        questions_text = "\n".join([f"- {q}" for q in contextual_questions])
-        
-        prompt = f"""You are an infrastructure repair expert. Analyze this issue and provide detailed work order information.
-
-Issue Type: {issue_type}
-Description: {description or 'No additional description provided'}
-
-Based on the issue type, consider these questions:
-{questions_text}
+        canonical_type = _canonical_issue_type(issue_type)
+        prompt = PROMPT_TEMPLATES[canonical_type].format(
+            issue_type=issue_type,
+            description=description or 'No additional description provided'
+        )
 
-Please provide:
-1. **MATERIALS NEEDED**: List specific materials with quantities (e.g., "50 lbs cold patch asphalt", "2 traffic signal bulbs", "10 sq ft concrete")
-2. **CONTRACTOR SPECIALTY**: Choose ONE from: pothole_repair, electrical, traffic_signal, general_contractor
-3. **REPAIR NOTES**: Detailed instructions for the contractor (2-3 sentences with specific steps)
-
-Format your response EXACTLY as:
-MATERIALS: [item1, item2, item3]
-SPECIALTY: [specialty]
-NOTES: [detailed notes]"""
-
-        response = model.generate_content(prompt)
+        response = await _prompt_batcher.submit(prompt)
         text = response.text.strip()
         
-        materials = ["Standard materials"]
-        specialty = "general_contractor"
-        notes = "See issue details"
+        fields = dict(FIELD_RE.findall(text))
         
-        # Enhanced parsing with better error handling
-        for line in text.split('\n'):
-            line = line.strip()
-            if line.startswith('MATERIALS:'):
-                materials_str = line.replace('MATERIALS:', '').strip()
-                # Handle both [item1, item2] and item1, item2 formats
-                if materials_str.startswith('[') and materials_str.endswith(']'):
-                    materials_str = materials_str[1:-1]
-                materials = [m.strip().strip('"').strip("'") for m in materials_str.split(',') if m.strip()]
-                if not materials:
-                    materials = [f"Materials for {issue_type} repair"]
-            elif line.startswith('SPECIALTY:'):
-                specialty = line.replace('SPECIALTY:', '').strip().lower()
-            elif line.startswith('NOTES:'):
-                notes = line.replace('NOTES:', '').strip()
-            else:
-                # If no specific field matched, continue to next line
-                continue
+        materials = ["Standard materials"]
+        if 'MATERIALS' in fields:
+            materials_str = fields['MATERIALS']
+            # Handle both [item1, item2] and item1, item2 formats
+            if materials_str.startswith('[') and materials_str.endswith(']'):
+                materials_str = materials_str[1:-1]
+            materials = [m.strip().strip('"').strip("'") for m in materials_str.split(',') if m.strip()]
+            if not materials:
+                materials = [f"Materials for {issue_type} repair"]
+        specialty = fields.get('SPECIALTY', 'general_contractor').lower()
+        notes = fields.get('NOTES', 'See issue details')
         
-        # Validate specialty
-        if specialty not in ['pothole_repair', 'electrical', 'traffic_signal', 'general_contractor']:
-            # Auto-detect based on issue type
-            if 'pothole' in issue_type:
-                specialty = 'pothole_repair'
-            elif 'traffic' in issue_type or 'signal' in issue_type or 'light' in issue_type:
-                specialty = 'traffic_signal'
-            elif 'electrical' in issue_type or 'power' in issue_type:
-                specialty = 'electrical'
-            else:
-                specialty = 'general_contractor'
+        # Validate specialty, auto-detecting from issue type if needed
+        if specialty not in VALID_SPECIALTIES:
+            specialty = SPECIALTY_BY_TYPE.get(issue_type) or _specialty_from_keywords(issue_type)
         
         # Ensure materials list is not empty
         if not materials or materials == ["Standard materials"]:
-            if issue_type == 'pothole' or 'pothole' in issue_type:
-                materials = ["Cold patch asphalt (50-100 lbs)", "Road base material", "Compaction equipment"]
-            elif issue_type == 'traffic_light' or 'traffic_light' in issue_type:
-                materials = ["Traffic signal bulbs", "Electrical wiring", "Signal controller components"]
-            else:
-                materials = [f"Materials for {issue_type} repair"]
+            default_materials = _default_materials(issue_type)
+            materials = list(default_materials) if default_materials else [f"Materials for {issue_type} repair"]
         
         logger.info(f"Generated work order suggestion for {issue_type}: {len(materials)} materials, {specialty} specialty")
+        # Cached with an immutable materials tuple; every caller gets its own list
+        WORK_ORDER_SUGGESTION_CACHE[cache_key] = {"materials": tuple(materials), "specialty": specialty, "notes": notes}
         return {"materials": materials, "specialty": specialty, "notes": notes}
     except Exception as e:
         logger.error(f"Error generating work order: {e}", exc_info=True)
@@ -3,79 +3,314 @@ Reverse Geocoding Service
 Converts GPS coordinates to human-readable place names using OpenStreetMap Nominatim API.
 """
 
+import atexit
 import logging
-import json
-from functools import lru_cache
-from typing import Optional, Tuple
+import orjson
+import sqlite3
+import threading
+from typing import Dict, List, Literal, Optional, Tuple
 from pathlib import Path
 import httpx
 import asyncio
-from datetime import datetime, timedelta
+from cachetools import TTLCache
+
+try:
+    import s2sphere
+except ImportError:  # Fall back to rounded-coordinate keys
+    s2sphere = None
+
+try:
+    import reverse_geocoder
+except ImportError:  # City-level lookups then go through Nominatim
+    reverse_geocoder = None
 
 logger = logging.getLogger(__name__)
 
 # Nominatim API endpoint (free, no API key required)
 NOMINATIM_BASE_URL = "https://nominatim.openstreetmap.org"
 
+# User-Agent is required by Nominatim usage policy
+NOMINATIM_HEADERS = {
+    "User-Agent": "NeuraCity Smart City Platform (contact: admin@neuracity.app)"
+}
+
 # Cache configuration
-CACHE_SIZE = 500
-CACHE_FILE = Path("backend/data/geocode_cache.json")  # Persistent cache file
-CACHE_DIR = CACHE_FILE.parent
+CACHE_DIR = Path(__file__).resolve().parents[2] / "data"  # backend/data, independent of the working directory
+CACHE_DB = CACHE_DIR / "geocode_cache.sqlite"  # Persistent cache (SQLite, WAL mode)
+# The old JSON cache was written relative to the working directory (the app
+# runs from backend/, so it landed in backend/backend/data); imported once,
+# from the first of these that exists, if the database is empty
+LEGACY_CACHE_NAME = "geocode_cache.json"
+LEGACY_CACHE_DIRS = (
+    CACHE_DIR,
+    CACHE_DIR.parent / "backend" / "data",
+)
+
+# S2 cell level for cache keys. Level 18 cells are ~30 m across, matching
+# Nominatim's zoom=18, so nearby points share an entry. Lower levels mean
+# fewer, coarser entries; higher levels mean more, finer ones.
+S2_LEVEL = 18
+
+# Failed lookups are remembered briefly (in memory only) so repeated bad
+# coordinates don't spend the rate-limit budget; the TTL allows recovery
+NEGATIVE_CACHE_TTL = 3600
+NEGATIVE_CACHE_SIZE = 10000
 
 # Rate limiting: Nominatim allows 1 request per second
-# Use a semaphore to limit concurrent requests
-_geocode_semaphore = asyncio.Semaphore(1)  # Only 1 concurrent request
-_last_request_time = None
-_min_request_interval = timedelta(seconds=1.1)  # 1.1 seconds between requests
+NOMINATIM_RATE = 1 / 1.1  # Requests per second, with a small safety margin
+NOMINATIM_BURST = 1
+
+# Shared HTTP client so keep-alive connections (and their TLS sessions) are reused
+_client: Optional[httpx.AsyncClient] = None
+_sync_client: Optional[httpx.Client] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Return the shared Nominatim client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=NOMINATIM_BASE_URL,
+            headers=NOMINATIM_HEADERS,
+            # Increase timeout to 10 seconds for better reliability
+            timeout=httpx.Timeout(10.0, pool=5.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        )
+    return _client
+
+
+def _get_sync_client() -> httpx.Client:
+    """Return the shared client for reverse_geocode_sync, creating it on first use."""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = httpx.Client(
+            base_url=NOMINATIM_BASE_URL,
+            headers=NOMINATIM_HEADERS,
+            timeout=5.0,
+            limits=httpx.Limits(max_keepalive_connections=4),
+        )
+        atexit.register(_sync_client.close)
+    return _sync_client
+
+
+async def aclose():
+    """Close the shared HTTP client (call on application shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class AsyncTokenBucket:
+    """
+    Async token bucket rate limiter.
+    Refills at `rate` tokens per second up to `burst`; acquire() waits for a token.
+    Uses the event loop's monotonic clock.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            if self._last_refill is not None:
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+
+            if self._tokens < 1:
+                # Waiters queue on the lock, so tokens are handed out in arrival order
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._last_refill = loop.time()
+                self._tokens = 1.0
+
+            self._tokens -= 1
+
+
+_bucket = AsyncTokenBucket(rate=NOMINATIM_RATE, burst=NOMINATIM_BURST)
+
+# Address keys tried in order for each location name component after the street
+_ADDRESS_COMPONENT_KEYS = (
+    ("neighbourhood", "suburb"),
+    ("city", "town", "village"),
+    ("state",),
+)
+
+# Nominatim requests in flight, by cache key
+_inflight: Dict[int, "asyncio.Future[Optional[str]]"] = {}
+
+
+def _rounded_key(lat: float, lng: float) -> int:
+    """
+    Key from coordinates rounded to 4 decimals (~11 m). Both are offset to
+    non-negative and packed into one int: latitude in the high bits,
+    longitude in the low 24.
+    """
+    return ((round(lat * 10000) + 900000) << 24) | (round(lng * 10000) + 1800000)
+
+
+def _unpack_rounded_key(key: int) -> Tuple[float, float]:
+    """Coordinates encoded in a _rounded_key."""
+    return ((key >> 24) - 900000) / 10000, ((key & 0xFFFFFF) - 1800000) / 10000
 
-# Track if cache has been modified (for periodic saves)
-_cache_modified = False
 
+if s2sphere is not None:
+    CACHE_TABLE = f"geo_s2_l{S2_LEVEL}"
 
-@lru_cache(maxsize=CACHE_SIZE)
-def _cache_key(lat: float, lng: float) -> str:
-    """Create cache key with rounded coordinates (to avoid cache misses from slight variations)."""
-    return f"{round(lat, 4)}_{round(lng, 4)}"
+    # Bits below a level-S2_LEVEL cell's position are constant (marker bit + zeros)
+    _S2_KEY_SHIFT = 2 * (s2sphere.CellId.MAX_LEVEL - S2_LEVEL) + 1
 
+    def _cache_key(lat: float, lng: float) -> int:
+        """
+        Cache key: the level-S2_LEVEL S2 cell containing the point, with the
+        constant low bits dropped so the key fits a signed 64-bit SQLite integer.
+        """
+        cell = s2sphere.CellId.from_lat_lng(s2sphere.LatLng.from_degrees(lat, lng)).parent(S2_LEVEL)
+        return cell.id() >> _S2_KEY_SHIFT
+else:
+    CACHE_TABLE = "geo"
+    _cache_key = _rounded_key
 
-def _load_cache_from_file() -> dict:
-    """Load geocoding cache from JSON file."""
+
+def _cache_keys(coordinates: List[Tuple[float, float]]) -> List[int]:
+    """Cache keys for many coordinates."""
+    return [_cache_key(lat, lng) for lat, lng in coordinates]
+
+
+def _migrate_cache_keys(cache_data: dict) -> dict:
+    """
+    Re-key legacy entries for the current key scheme. Accepts rounded int
+    keys (or their string form, as read from JSON) and "lat_lng" strings.
+    """
+    migrated = {}
+    for key, location_name in cache_data.items():
+        try:
+            if isinstance(key, str) and "_" in key:
+                lat, lng = key.split("_")
+                migrated[_cache_key(float(lat), float(lng))] = location_name
+            else:
+                migrated[_cache_key(*_unpack_rounded_key(int(key)))] = location_name
+        except ValueError:
+            logger.debug(f"Dropping unrecognized geocoding cache key: {key}")
+    return migrated
+
+
+def _open_cache_db() -> Optional[sqlite3.Connection]:
+    """Open (creating if needed) the persistent geocoding cache database."""
     try:
-        if CACHE_FILE.exists():
-            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
-                logger.info(f"Loaded {len(cache_data)} geocoding entries from cache file")
-                return cache_data
-        else:
-            logger.info("No geocoding cache file found, starting fresh")
-            return {}
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(CACHE_DB, isolation_level=None, check_same_thread=False)
+        # WAL appends each insert instead of rewriting the file
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {CACHE_TABLE} (k INTEGER PRIMARY KEY, v TEXT NOT NULL)")
+        return conn
+    except Exception as e:
+        logger.warning(f"Failed to open geocoding cache database, using memory only: {e}")
+        return None
+
+
+def _find_legacy_cache_file() -> Optional[Path]:
+    """The old JSON cache file, if one exists at any location it used to be written to."""
+    for directory in (*LEGACY_CACHE_DIRS, Path.cwd() / "backend" / "data"):
+        legacy_file = directory / LEGACY_CACHE_NAME
+        if legacy_file.exists():
+            return legacy_file
+    return None
+
+
+def _load_cache(conn: Optional[sqlite3.Connection]) -> dict:
+    """Load all cached entries into memory, importing legacy entries on first run."""
+    if conn is None:
+        return {}
+    try:
+        cache_data = dict(conn.execute(f"SELECT k, v FROM {CACHE_TABLE}"))
+        if not cache_data:
+            has_rounded_table = CACHE_TABLE != "geo" and conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'geo'"
+            ).fetchone()
+            if has_rounded_table:
+                legacy, source = dict(conn.execute("SELECT k, v FROM geo")), "rounded-key table"
+            elif (legacy_file := _find_legacy_cache_file()) is not None:
+                legacy, source = orjson.loads(legacy_file.read_bytes()), str(legacy_file)
+            else:
+                legacy, source = {}, None
+            if legacy:
+                cache_data = _migrate_cache_keys(legacy)
+                with conn:
+                    conn.executemany(f"INSERT OR REPLACE INTO {CACHE_TABLE} (k, v) VALUES (?, ?)", cache_data.items())
+                logger.info(f"Imported {len(cache_data)} geocoding entries from {source}")
+        logger.info(f"Loaded {len(cache_data)} geocoding entries from cache database")
+        return cache_data
     except Exception as e:
         logger.warning(f"Failed to load geocoding cache: {e}")
         return {}
 
 
-def _save_cache_to_file():
-    """Save geocoding cache to JSON file."""
-    global _cache_modified
+# Persistent cache, opened on first use (or at startup via open_cache);
+# reads are served from the in-memory dict loaded from it
+_cache_db: Optional[sqlite3.Connection] = None
+_cache_db_lock = threading.Lock()  # The sync path may write from other threads
+_geocode_cache: Dict[int, str] = {}
+_cache_opened = False
+_failed_lookups = TTLCache(maxsize=NEGATIVE_CACHE_SIZE, ttl=NEGATIVE_CACHE_TTL)
+
+
+def open_cache():
+    """Open the persistent cache database and load it into memory (once; thread-safe)."""
+    global _cache_db, _cache_opened
+    with _cache_db_lock:
+        if _cache_opened:
+            return
+        _cache_db = _open_cache_db()
+        _geocode_cache.update(_load_cache(_cache_db))
+        _cache_opened = True
+
+
+def close_cache():
+    """Close the persistent cache database (call on application shutdown)."""
+    global _cache_db, _cache_opened
+    with _cache_db_lock:
+        if _cache_db is not None:
+            _cache_db.close()
+            _cache_db = None
+        _geocode_cache.clear()
+        _cache_opened = False
+
+
+def _get_cache() -> Dict[int, str]:
+    """The in-memory geocoding cache, opening the database on first use."""
+    if not _cache_opened:
+        open_cache()
+    return _geocode_cache
+
+
+def _store_location(cache_key: int, location_name: str):
+    """Cache a geocoding result in memory and persist that single row."""
+    _get_cache()[cache_key] = location_name
+    if _cache_db is None:
+        return
     try:
-        # Create cache directory if it doesn't exist
-        CACHE_DIR.mkdir(parents=True, exist_ok=True)
-        
-        # Save to temporary file first, then rename (atomic write)
-        temp_file = CACHE_FILE.with_suffix('.tmp')
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            json.dump(_geocode_cache, f, indent=2, ensure_ascii=False)
-        
-        # Atomic rename
-        temp_file.replace(CACHE_FILE)
-        _cache_modified = False
-        logger.debug(f"Saved {len(_geocode_cache)} geocoding entries to cache file")
-    except Exception as e:
-        logger.error(f"Failed to save geocoding cache: {e}")
+        with _cache_db_lock:
+            _cache_db.execute(f"INSERT OR REPLACE INTO {CACHE_TABLE} (k, v) VALUES (?, ?)", (cache_key, location_name))
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to persist geocoding cache entry: {e}")
 
 
-# In-memory cache with rounded coordinates (loaded from file on startup)
-_geocode_cache = _load_cache_from_file()
+def reverse_geocode_cached(lat: float, lng: float) -> Optional[str]:
+    """
+    Cache-only lookup: the location name if already cached, else None.
+    Never calls the API, and once the cache is open never takes a lock, so it
+    is cheap in hot loops and safe to call from any thread (a single dict read).
+    Fall back to reverse_geocode for misses.
+    """
+    return _get_cache().get(_cache_key(lat, lng))
 
 
 async def reverse_geocode(lat: float, lng: float, retries: int = 2) -> Optional[str]:
@@ -95,93 +330,85 @@ async def reverse_geocode(lat: float, lng: float, retries: int = 2) -> Optional[
         >>> location = await reverse_geocode(37.7749, -122.4194)
         >>> print(location)  # "San Francisco, CA, USA"
     """
-    global _cache_modified
-    
-    # Check cache first (using rounded coords to increase cache hits)
+    # Check cache first (nearby points share a key to increase cache hits)
     cache_key = _cache_key(lat, lng)
-    if cache_key in _geocode_cache:
+    cache = _get_cache()
+    if cache_key in cache:
         logger.debug(f"Cache hit for {lat}, {lng}")
-        return _geocode_cache[cache_key]
-
-    # Use semaphore to limit concurrent requests and respect rate limits
-    async with _geocode_semaphore:
-        global _last_request_time
-        
-        # Rate limiting: wait if needed
-        if _last_request_time:
-            time_since_last = datetime.now() - _last_request_time
-            if time_since_last < _min_request_interval:
-                wait_time = (_min_request_interval - time_since_last).total_seconds()
+        return cache[cache_key]
+    if cache_key in _failed_lookups:
+        logger.debug(f"Recent geocoding failure for {lat}, {lng}, skipping API call")
+        return None
+
+    # Concurrent misses for the same key share one API request
+    request = _inflight.get(cache_key)
+    if request is None:
+        request = asyncio.ensure_future(_request_location(lat, lng, cache_key, retries))
+        _inflight[cache_key] = request
+        request.add_done_callback(lambda done: _finish_request(cache_key, done))
+    # Shielded so a cancelled caller doesn't cancel the request for the others
+    return await asyncio.shield(request)
+
+
+def _finish_request(cache_key: int, request: asyncio.Future):
+    """Drop a finished request from the in-flight table, remembering failures."""
+    _inflight.pop(cache_key, None)
+    if not request.cancelled() and request.exception() is None and request.result() is None:
+        _failed_lookups[cache_key] = True
+
+
+async def _request_location(lat: float, lng: float, cache_key: int, retries: int) -> Optional[str]:
+    """Fetch a location name from Nominatim and cache it (rate limited, with retries)."""
+    # Retry logic with exponential backoff
+    for attempt in range(retries + 1):
+        try:
+            params = {
+                "lat": lat,
+                "lon": lng,
+                "format": "json",
+                "addressdetails": 1,
+                "zoom": 18,  # Street-level detail
+            }
+
+            # Every attempt (including retries) takes a token from the rate limiter
+            await _bucket.acquire()
+            response = await _get_client().get("/reverse", params=params)
+
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                location_name = _format_location_name(data)
+
+                _store_location(cache_key, location_name)
+                logger.info(f"Geocoded ({lat}, {lng}) -> {location_name}")
+
+                return location_name
+            elif response.status_code == 429:  # Rate limited
+                wait_time = (2 ** attempt) * 2  # Exponential backoff: 2s, 4s, 8s
+                logger.warning(f"Rate limited, waiting {wait_time}s before retry {attempt + 1}/{retries}")
+                await asyncio.sleep(wait_time)
+                continue
+            else:
+                logger.warning(f"Nominatim API returned status {response.status_code}")
+                return None
+
+        except httpx.TimeoutException:
+            if attempt < retries:
+                wait_time = (2 ** attempt) * 1  # Exponential backoff: 1s, 2s, 4s
+                logger.debug(f"Timeout while geocoding ({lat}, {lng}), retrying in {wait_time}s (attempt {attempt + 1}/{retries})")
                 await asyncio.sleep(wait_time)
-        
-        _last_request_time = datetime.now()
-
-        # Retry logic with exponential backoff
-        for attempt in range(retries + 1):
-            try:
-                # Make request to Nominatim API
-                # User-Agent is required by Nominatim usage policy
-                headers = {
-                    "User-Agent": "NeuraCity Smart City Platform (contact: admin@neuracity.app)"
-                }
-
-                params = {
-                    "lat": lat,
-                    "lon": lng,
-                    "format": "json",
-                    "addressdetails": 1,
-                    "zoom": 18,  # Street-level detail
-                }
-
-                # Increase timeout to 10 seconds for better reliability
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    response = await client.get(
-                        f"{NOMINATIM_BASE_URL}/reverse",
-                        params=params,
-                        headers=headers,
-                    )
-
-                    if response.status_code == 200:
-                        data = response.json()
-                        location_name = _format_location_name(data)
-
-                        # Cache the result (both in-memory and mark for file save)
-                        _geocode_cache[cache_key] = location_name
-                        _cache_modified = True
-                        logger.info(f"Geocoded ({lat}, {lng}) -> {location_name}")
-
-                        # Save cache periodically (every 10 new entries to avoid too frequent writes)
-                        if len(_geocode_cache) % 10 == 0:
-                            _save_cache_to_file()
-
-                        return location_name
-                    elif response.status_code == 429:  # Rate limited
-                        wait_time = (2 ** attempt) * 2  # Exponential backoff: 2s, 4s, 8s
-                        logger.warning(f"Rate limited, waiting {wait_time}s before retry {attempt + 1}/{retries}")
-                        await asyncio.sleep(wait_time)
-                        continue
-                    else:
-                        logger.warning(f"Nominatim API returned status {response.status_code}")
-                        return None
-
-            except httpx.TimeoutException:
-                if attempt < retries:
-                    wait_time = (2 ** attempt) * 1  # Exponential backoff: 1s, 2s, 4s
-                    logger.debug(f"Timeout while geocoding ({lat}, {lng}), retrying in {wait_time}s (attempt {attempt + 1}/{retries})")
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    logger.warning(f"Timeout while geocoding ({lat}, {lng}) after {retries + 1} attempts")
-                    return None
-            except Exception as e:
-                if attempt < retries:
-                    wait_time = (2 ** attempt) * 1
-                    logger.debug(f"Error geocoding ({lat}, {lng}): {e}, retrying in {wait_time}s")
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    logger.error(f"Error geocoding ({lat}, {lng}) after {retries + 1} attempts: {e}")
-                    return None
+                continue
+            else:
+                logger.warning(f"Timeout while geocoding ({lat}, {lng}) after {retries + 1} attempts")
+                return None
+        except Exception as e:
+            if attempt < retries:
+                wait_time = (2 ** attempt) * 1
+                logger.debug(f"Error geocoding ({lat}, {lng}): {e}, retrying in {wait_time}s")
+                await asyncio.sleep(wait_time)
+                continue
+            else:
+                logger.error(f"Error geocoding ({lat}, {lng}) after {retries + 1} attempts: {e}")
+                return None
 
     return None
 
@@ -196,124 +423,152 @@ def _format_location_name(data: dict) -> str:
     3. City + State
     4. Display name (fallback)
     """
-    try:
-        address = data.get("address", {})
-
-        # Build location string with available components
-        parts = []
-
-        # Street address components
-        house_number = address.get("house_number", "")
-        road = address.get("road", "")
-        if house_number and road:
-            parts.append(f"{house_number} {road}")
-        elif road:
-            parts.append(road)
-
-        # Neighborhood or suburb
-        neighborhood = address.get("neighbourhood") or address.get("suburb")
-        if neighborhood:
-            parts.append(neighborhood)
-
-        # City
-        city = address.get("city") or address.get("town") or address.get("village")
-        if city:
-            parts.append(city)
-
-        # State/Region
-        state = address.get("state")
-        if state:
-            parts.append(state)
-
-        # If we have parts, join them
-        if parts:
-            # Limit to first 3 parts for conciseness
-            return ", ".join(parts[:3])
-
-        # Fallback to display name
-        display_name = data.get("display_name", "")
-        if display_name:
-            # Limit display name length
-            return display_name[:80] + ("..." if len(display_name) > 80 else "")
-
-        return "Unknown Location"
+    address = data.get("address") or {}
 
-    except Exception as e:
-        logger.error(f"Error formatting location name: {e}")
-        return data.get("display_name", "Unknown Location")
+    # Build location string with available components
+    parts = []
+
+    # Street address components
+    road = address.get("road")
+    if road:
+        house_number = address.get("house_number")
+        parts.append(f"{house_number} {road}" if house_number else road)
+
+    # Neighborhood, city and state: first non-empty key of each group
+    for keys in _ADDRESS_COMPONENT_KEYS:
+        for key in keys:
+            value = address.get(key)
+            if value:
+                parts.append(value)
+                break
+
+    if parts:
+        # Limit to first 3 parts for conciseness
+        return ", ".join(parts[:3])
+
+    # Fallback to display name, limited in length
+    display_name = data.get("display_name")
+    if display_name:
+        return display_name[:80] + ("..." if len(display_name) > 80 else "")
+
+    return "Unknown Location"
+
+
+# Offline GeoNames kd-tree for city-level names, built on first use
+_offline_geocoder = None
+_offline_geocoder_lock = threading.Lock()
+
+
+def _get_offline_geocoder():
+    """Return the offline reverse geocoder, loading it on first use (blocking)."""
+    global _offline_geocoder
+    if _offline_geocoder is None:
+        with _offline_geocoder_lock:
+            if _offline_geocoder is None:
+                # Single-process mode; the query batches here are small
+                _offline_geocoder = reverse_geocoder.RGeocoder(mode=1, verbose=False)
+    return _offline_geocoder
 
 
-async def batch_reverse_geocode(coordinates: list[Tuple[float, float]]) -> dict[Tuple[float, float], str]:
+def _format_offline_place(place: dict) -> str:
+    """Format an offline geocoder result as "City, Region, CC"."""
+    return ", ".join(part for part in (place.get("name"), place.get("admin1"), place.get("cc")) if part)
+
+
+def _reverse_geocode_offline_batch(coordinates: List[Tuple[float, float]]) -> List[str]:
+    """City-level names for many coordinates in one kd-tree query (blocking)."""
+    return [_format_offline_place(place) for place in _get_offline_geocoder().query(coordinates)]
+
+
+def reverse_geocode_offline(lat: float, lng: float) -> Optional[str]:
+    """
+    City-level place name (e.g., "Atlanta, Georgia, US") from the offline
+    GeoNames data, with no API call. Blocking; the first call loads the data.
+
+    Returns:
+        None if the optional reverse_geocoder package is not installed
+    """
+    if reverse_geocoder is None:
+        return None
+    return _reverse_geocode_offline_batch([(lat, lng)])[0]
+
+
+async def batch_reverse_geocode(
+    coordinates: list[Tuple[float, float]],
+    precision: Literal["street", "city"] = "street"
+) -> dict[Tuple[float, float], str]:
     """
     Reverse geocode multiple coordinates efficiently.
-    Checks file cache first, only makes API calls for uncached coordinates.
+    Checks the cache first, only makes API calls for uncached coordinates.
 
     Args:
         coordinates: List of (lat, lng) tuples
+        precision: "street" for Nominatim street-level names; "city" serves
+            city-level names from offline GeoNames data with no API calls
+            (falls back to "street" if reverse_geocoder is not installed)
 
     Returns:
         dict: Mapping of (lat, lng) -> location_name
 
     Note:
         Respects Nominatim rate limit (1 request per second) for uncached requests.
-        File cache is checked first for instant lookups.
+        The cache is checked first for instant lookups.
     """
+    if precision == "city" and reverse_geocoder is not None and coordinates:
+        names = await asyncio.to_thread(_reverse_geocode_offline_batch, list(coordinates))
+        return dict(zip(coordinates, names))
+
     results = {}
     uncached_coords = []
+    cache = _get_cache()
 
-    # First pass: Check cache for all coordinates (fast, no API calls)
-    for lat, lng in coordinates:
-        cache_key = _cache_key(lat, lng)
-        if cache_key in _geocode_cache:
-            # Cache hit - instant lookup
-            results[(lat, lng)] = _geocode_cache[cache_key]
+    # First pass: plain cache lookups for all coordinates (no coroutines, no API calls)
+    for (lat, lng), cache_key in zip(coordinates, _cache_keys(coordinates)):
+        location = cache.get(cache_key)
+        if location is not None:
+            results[(lat, lng)] = location
         else:
             # Cache miss - will need to geocode
             uncached_coords.append((lat, lng))
 
-    # Second pass: Only geocode uncached coordinates (respects rate limits)
-    # This minimizes API calls and wait time
-    for lat, lng in uncached_coords:
-        location = await reverse_geocode(lat, lng)
+    # Second pass: geocode uncached coordinates concurrently; the rate limiter
+    # inside reverse_geocode still spaces the actual API requests
+    locations = await asyncio.gather(
+        *(reverse_geocode(lat, lng) for lat, lng in uncached_coords),
+        return_exceptions=True
+    )
+    for (lat, lng), location in zip(uncached_coords, locations):
+        if isinstance(location, BaseException):
+            logger.warning(f"Error geocoding ({lat}, {lng}): {location}")
+            location = None
         results[(lat, lng)] = location or f"{lat:.4f}, {lng:.4f}"
 
     return results
 
 
 def clear_cache():
-    """Clear the geocoding cache (both in-memory and file)."""
-    global _geocode_cache, _cache_modified
-    _geocode_cache = {}
-    _cache_modified = True
-    if CACHE_FILE.exists():
-        CACHE_FILE.unlink()
+    """Clear the geocoding cache (both in-memory and database)."""
+    _get_cache().clear()
+    _failed_lookups.clear()
+    if _cache_db is not None:
+        with _cache_db_lock:
+            _cache_db.execute(f"DELETE FROM {CACHE_TABLE}")
     logger.info("Geocoding cache cleared")
 
 
-def save_cache():
-    """Manually save cache to file (useful for shutdown hooks)."""
-    if _cache_modified:
-        _save_cache_to_file()
-
-
 # Synchronous version for non-async contexts
 def reverse_geocode_sync(lat: float, lng: float) -> Optional[str]:
     """
     Synchronous version of reverse_geocode.
     Use only when async is not available.
     """
-    global _cache_modified
-    
     try:
-        import requests
-
         cache_key = _cache_key(lat, lng)
-        if cache_key in _geocode_cache:
-            return _geocode_cache[cache_key]
-
-        headers = {
-            "User-Agent": "NeuraCity Smart City Platform (contact: admin@neuracity.app)"
-        }
+        cache = _get_cache()
+        if cache_key in cache:
+            return cache[cache_key]
+        if cache_key in _failed_lookups:
+            return None
 
         params = {
             "lat": lat,
@@ -323,23 +578,15 @@ def reverse_geocode_sync(lat: float, lng: float) -> Optional[str]:
             "zoom": 18,
         }
 
-        response = requests.get(
-            f"{NOMINATIM_BASE_URL}/reverse",
-            params=params,
-            headers=headers,
-            timeout=5.0
-        )
+        response = _get_sync_client().get("/reverse", params=params)
 
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             location_name = _format_location_name(data)
-            _geocode_cache[cache_key] = location_name
-            _cache_modified = True
-            # Save cache periodically
-            if len(_geocode_cache) % 10 == 0:
-                _save_cache_to_file()
+            _store_location(cache_key, location_name)
             return location_name
 
+        _failed_lookups[cache_key] = True
         return None
 
     except Exception as e:
@@ -1,6 +1,6 @@
 """Image handling service for file uploads."""
+import asyncio
 import os
-import uuid
 from fastapi import UploadFile, HTTPException
 from app.core.config import get_settings
 import logging
@@ -9,48 +9,91 @@ logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
+# Uploads are streamed to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 64 * 1024
+_ALLOWED_EXTENSIONS = frozenset(settings.ALLOWED_IMAGE_EXTENSIONS)
+
+
+def _image_extension(filename: str) -> str:
+    """Lowercased file extension, defaulting to jpg when there is none."""
+    _, dot, ext = (filename or "").rpartition('.')
+    return ext.lower() if dot else 'jpg'
+
+
+def _file_too_large() -> HTTPException:
+    """400 error for uploads over MAX_UPLOAD_SIZE."""
+    return HTTPException(
+        status_code=400,
+        detail=f"File too large. Max size: {settings.MAX_UPLOAD_SIZE / (1024*1024):.1f}MB"
+    )
+
+
 async def validate_image(file: UploadFile) -> bool:
-    """Validate image file type and size."""
+    """
+    Validate image file type.
+    Size is enforced by save_image while streaming, so the body isn't read here.
+    """
     if file.content_type not in settings.ALLOWED_IMAGE_TYPES:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid file type. Allowed types: {', '.join(settings.ALLOWED_IMAGE_TYPES)}"
         )
     
-    content = await file.read()
-    await file.seek(0)
-    
-    if len(content) > settings.MAX_UPLOAD_SIZE:
+    if _image_extension(file.filename) not in _ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
-            detail=f"File too large. Max size: {settings.MAX_UPLOAD_SIZE / (1024*1024):.1f}MB"
+            detail=f"Invalid file extension. Allowed extensions: {', '.join(settings.ALLOWED_IMAGE_EXTENSIONS)}"
         )
     
+    # Reject early when the spooled upload already reports its size
+    if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE:
+        raise _file_too_large()
+    
     return True
 
 
 async def save_image(file: UploadFile) -> str:
-    """Save uploaded image and return filename."""
+    """
+    Save uploaded image and return filename.
+    The body is streamed to disk in UPLOAD_CHUNK_SIZE chunks; uploads over
+    MAX_UPLOAD_SIZE are rejected and the partial file removed.
+    """
     try:
-        ext = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
-        filename = f"issue_{uuid.uuid4().hex[:12]}.{ext}"
+        ext = _image_extension(file.filename)
+        filename = f"issue_{os.urandom(6).hex()}.{ext}"
         filepath = os.path.join(settings.UPLOAD_DIR, filename)
         
-        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+        await asyncio.to_thread(os.makedirs, settings.UPLOAD_DIR, exist_ok=True)
+        
+        # Disk writes run in a worker thread so large uploads don't block the event loop
+        total = 0
+        too_large = False
+        f = await asyncio.to_thread(open, filepath, 'wb')
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                total += len(chunk)
+                if total > settings.MAX_UPLOAD_SIZE:
+                    too_large = True
+                    break
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
         
-        content = await file.read()
-        with open(filepath, 'wb') as f:
-            f.write(content)
+        if too_large:
+            await asyncio.to_thread(os.remove, filepath)
+            raise _file_too_large()
         
         logger.info(f"Saved image: {filename}")
         return filename
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error saving image: {e}")
         raise HTTPException(status_code=500, detail="Failed to save image")
 
 
 def delete_image(filename: str) -> bool:
-    """Delete image file."""
+    """Delete image file (blocking; call via asyncio.to_thread from async code)."""
     try:
         filepath = os.path.join(settings.UPLOAD_DIR, filename)
         if os.path.exists(filepath):
@@ -5,13 +5,23 @@ Uses OpenRouteService for real street-based routing.
 """
 import google.generativeai as genai
 from app.core.config import get_settings
+from app.utils.cache import ROUTE_PLAN_CACHE, STREET_ROUTE_CACHE, get_cache_stats
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import AsyncIterator, List, Dict, Any, Literal, Optional, Tuple
+from dataclasses import dataclass
 from datetime import datetime
+import asyncio
 import json
+import orjson
 import re
 import math
 import httpx
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # Proximity checks then use the dense distance matrix
+    cKDTree = None
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -25,6 +35,125 @@ except Exception as e:
     logger.error(f"Failed to initialize Gemini for ML routing: {e}")
     model = None
 
+# Shared client for OpenRouteService/OSRM so connections are pooled across requests
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Return the shared street routing client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, pool=5.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        )
+    return _client
+
+
+async def aclose():
+    """Close the shared HTTP client (call on application shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+# Static instructions lead each prompt verbatim so the request prefix stays
+# identical across calls; per-request facts are appended after them.
+_PATH_SYSTEM_PROMPT = """You are a navigation system. Refine the route below so it:
+1. Follows realistic road patterns with smooth turns (not straight lines)
+2. Avoids the listed issue locations
+3. Has 2-4 intermediate waypoints
+
+Respond with ONLY JSON: {"waypoints": [{"lat": float, "lng": float}, ...]}
+
+Route details:"""
+
+_METRICS_SYSTEM_PROMPT = """You are a transportation analytics AI. Predict realistic metrics for the route below.
+- drive: ETA from traffic, time of day and issues; CO2 from distance and idling
+- eco: ETA slightly above drive (avoids congestion); CO2 20-30% below drive
+- quiet_walk: ETA at ~5 km/h walking pace; average noise encountered (dB)
+
+Respond with ONLY JSON, reasoning last:
+{"eta_minutes": float, "co2_kg": float, "avg_noise_db": float, "congestion_score": 0-1, "reasoning": "short explanation"}
+
+Route details:"""
+
+# Full prompt templates: the static instructions (braces escaped) plus the per-request facts
+_PATH_PROMPT_TEMPLATE = _PATH_SYSTEM_PROMPT.replace("{", "{{").replace("}", "}}") + """
+
+Origin: ({origin_lat:.6f}, {origin_lng:.6f})
+Destination: ({dest_lat:.6f}, {dest_lng:.6f})
+Route Type: {route_type}
+Current Waypoints: {num_waypoints} points{issue_context}"""
+
+_METRICS_PROMPT_TEMPLATE = _METRICS_SYSTEM_PROMPT.replace("{", "{{").replace("}", "}}") + """
+
+Distance: {distance_km:.2f} km
+Route Type: {route_type}
+Time: {hour_str} {rush_hour}
+Weather: {weather}
+Average Traffic Congestion: {avg_traffic:.2f} (0-1 scale)
+Average Noise Level: {avg_noise:.1f} dB
+High-Severity Issues on Route: {high_severity_issues}"""
+
+# Metric predictions should be repeatable for identical inputs
+_METRICS_GENERATION_CONFIG = {"temperature": 0}
+
+# Model responses are only scanned this far; longer output is a runaway generation
+MAX_RESPONSE_CHARS = 8192
+
+# Gemini path refinement only runs when at least this many issues need avoiding
+ML_PATH_REFINEMENT_MIN_ISSUES = 1
+
+# Below this many critical issues the dense waypoint x issue matrix beats building a KD-tree
+KD_TREE_MIN_ISSUES = 64
+
+# Lenient about raw control characters, which Gemini sometimes leaves inside strings
+_JSON_DECODER = json.JSONDecoder(strict=False)
+
+# Route plans are cached on quantized inputs: ~110m coordinate cells and 2-hour buckets
+ROUTE_CACHE_PRECISION = 3
+ROUTE_CACHE_HOUR_BUCKET = 2
+# Street geometry doesn't depend on conditions, so it is cached on finer (~11m) endpoints alone
+STREET_ROUTE_CACHE_PRECISION = 4
+# Street route fetches in flight, so concurrent requests for the same cache key share one
+_street_route_inflight: Dict[Tuple, asyncio.Future] = {}
+_route_cache_hits = 0
+_route_cache_misses = 0
+
+
+def _extract_json_object(text: str, required_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the first JSON object in a model response that has required_key.
+    Only the first MAX_RESPONSE_CHARS characters are considered.
+    Each candidate is parsed in a single linear pass by the JSON decoder,
+    so malformed output cannot trigger regex backtracking.
+    """
+    text = text[:MAX_RESPONSE_CHARS]
+    start = text.find('{')
+    if start == -1:
+        return None
+    
+    # Usual case: the response is one object, possibly wrapped in a code fence
+    try:
+        result = orjson.loads(text[start:text.rfind('}') + 1])
+        if isinstance(result, dict) and required_key in result:
+            return result
+    except orjson.JSONDecodeError:
+        pass
+    
+    while start != -1:
+        try:
+            result, end = _JSON_DECODER.raw_decode(text, start)
+        except ValueError:
+            start = text.find('{', start + 1)
+            continue
+        if isinstance(result, dict) and required_key in result:
+            return result
+        start = text.find('{', end)
+    return None
+
 
 def haversine_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """Calculate distance in km between two coordinates."""
@@ -32,15 +161,28 @@ def haversine_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> fl
     
     lat1_rad = math.radians(lat1)
     lat2_rad = math.radians(lat2)
-    dlat = math.radians(lat2 - lat1)
+    dlat = lat2_rad - lat1_rad
     dlng = math.radians(lng2 - lng1)
     
     a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng/2)**2
-    c = 2 * math.asin(math.sqrt(a))
+    # atan2 form stays in-domain when rounding pushes a past 1 (near-antipodal points)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(max(0.0, 1 - a)))
     
     return R * c
 
 
+def _flat_distance_sq(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """
+    Squared equirectangular distance in km^2; scalar or NumPy array inputs broadcast together.
+    Within a few km this agrees with haversine to well under a meter, at the cost of
+    one cosine per first point; use it for short-range proximity tests only.
+    """
+    cos_lat1 = np.cos(np.radians(lat1))
+    dy = np.radians(np.subtract(lat2, lat1))
+    dx = np.radians(np.subtract(lng2, lng1)) * cos_lat1
+    return 6371 ** 2 * (dx * dx + dy * dy)
+
+
 async def plan_route_ml(
     origin_lat: float,
     origin_lng: float,
@@ -51,7 +193,9 @@ async def plan_route_ml(
     traffic: List[Dict] = None,
     noise: List[Dict] = None,
     time_of_day: Optional[datetime] = None,
-    weather: Optional[str] = None
+    weather: Optional[str] = None,
+    context_summary: Optional[Dict[str, Any]] = None,
+    llm_policy: Literal["auto", "always", "never"] = "auto"
 ) -> Dict[str, Any]:
     """
     Use Gemini AI to plan an intelligent route with realistic predictions.
@@ -65,6 +209,9 @@ async def plan_route_ml(
         noise: Noise level data
         time_of_day: Current time
         weather: Weather conditions
+        context_summary: Precomputed summarize_context(issues, traffic, noise)
+        llm_policy: 'auto' skips Gemini when there is no context to reason about,
+            'always' / 'never' force the ML or formula path
         
     Returns:
         dict: Route with path, metrics, and explanation
@@ -77,102 +224,391 @@ async def plan_route_ml(
     
     if not model:
         logger.warning("ML routing unavailable, using fallback")
-        return await _fallback_route(
+        return _fallback_route(
             origin_lat, origin_lng, dest_lat, dest_lng,
-            route_type, distance_km, issues, traffic, noise
+            route_type, distance_km, issues, traffic, noise, context_summary
         )
     
-    # Generate realistic waypoints along the route
-    path = await generate_path_ml(
+    if not _should_use_llm(issues, traffic, noise, weather, llm_policy):
+        return await _route_without_llm(
+            origin_lat, origin_lng, dest_lat, dest_lng,
+            route_type, distance_km, issues, traffic, noise, context_summary
+        )
+    
+    global _route_cache_hits, _route_cache_misses
+    cache_key = _route_cache_key(
         origin_lat, origin_lng, dest_lat, dest_lng,
-        route_type, issues
+        route_type, time_of_day, weather
     )
+    cached = ROUTE_PLAN_CACHE.get(cache_key)
+    if cached is not None:
+        _route_cache_hits += 1
+        return _route_for_endpoints(cached, origin_lat, origin_lng, dest_lat, dest_lng)
+    _route_cache_misses += 1
+    
+    if context_summary is None:
+        context_summary = summarize_context(issues, traffic, noise)
     
-    # Get ML-predicted metrics
-    metrics = await predict_route_metrics_ml(
-        distance_km, route_type, time_of_day,
-        issues, traffic, noise, weather
+    # Waypoints and ML-predicted metrics are independent, so fetch them concurrently
+    path, metrics = await asyncio.gather(
+        _generate_path(
+            origin_lat, origin_lng, dest_lat, dest_lng,
+            route_type, issues
+        ),
+        predict_route_metrics_ml(
+            distance_km, route_type, time_of_day,
+            issues, traffic, noise, weather, context_summary
+        )
     )
     
-    # Convert path from List[Dict] to List[Tuple[float, float]] for schema validation
-    path_tuples = [(point['lat'], point['lng']) for point in path]
+    # Convert path to List[Tuple[float, float]] for schema validation
+    path_tuples = _path_tuples(path)
     
-    return {
+    route = {
         "route_type": route_type,
         "path": path_tuples,
         "metrics": metrics['metrics'],
         "explanation": metrics['explanation']
     }
+    ROUTE_PLAN_CACHE[cache_key] = route
+    return _route_for_endpoints(route, origin_lat, origin_lng, dest_lat, dest_lng)
 
 
-async def generate_path_ml(
+async def plan_routes_ml_batch(
+    requests: List[Dict[str, Any]],
+    max_concurrency: int = 20
+) -> List[Any]:
+    """
+    Plan many routes concurrently.
+    Routes sharing the same issues/traffic/noise lists share one context summary.
+    
+    Args:
+        requests: plan_route_ml keyword arguments, one dict per route
+        max_concurrency: Maximum routes planned at once
+        
+    Returns:
+        list: Route dicts in request order; a failed route's entry is its exception
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    summaries: Dict[Tuple[int, int, int], Dict[str, Any]] = {}
+    no_data: List[Dict] = []
+    
+    def _with_summary(request: Dict[str, Any]) -> Dict[str, Any]:
+        if request.get('context_summary') is not None:
+            return request
+        issues = request.get('issues') or no_data
+        traffic = request.get('traffic') or no_data
+        noise = request.get('noise') or no_data
+        # The requests keep these lists alive for the whole batch, so their ids are stable keys
+        key = (id(issues), id(traffic), id(noise))
+        if key not in summaries:
+            summaries[key] = summarize_context(issues, traffic, noise)
+        return {**request, 'context_summary': summaries[key]}
+    
+    async def _plan_one(request: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await plan_route_ml(**request)
+    
+    return await asyncio.gather(
+        *(_plan_one(_with_summary(request)) for request in requests),
+        return_exceptions=True
+    )
+
+
+async def plan_routes_batch(
     origin_lat: float,
     origin_lng: float,
     dest_lat: float,
     dest_lng: float,
-    route_type: str,
-    issues: List[Dict]
-) -> List[Dict[str, float]]:
+    route_types: List[str],
+    issues: List[Dict] = None,
+    traffic: List[Dict] = None,
+    noise: List[Dict] = None,
+    time_of_day: Optional[datetime] = None,
+    weather: Optional[str] = None
+) -> Dict[str, Any]:
     """
-    Generate realistic waypoints that follow actual streets and avoid high-severity issues.
-    Uses OpenRouteService for real street-based routing, then adjusts to avoid issues.
+    Plan several route types between the same endpoints concurrently.
+    The context is summarized once and shared by all route types.
     
     Returns:
-        List of {lat, lng} waypoints
+        dict: route_type -> route dict, or the exception if that route failed
     """
-    # Filter issues to avoid based on route type and severity
-    # For drive routes: avoid accidents (critical priority) and high severity (> 0.6)
-    # For eco routes: avoid high severity issues (> 0.7)
-    # For quiet_walk: avoid medium-high severity (> 0.5)
+    route_types = list(dict.fromkeys(route_types))
+    issues = issues or []
+    traffic = traffic or []
+    noise = noise or []
+    context_summary = summarize_context(issues, traffic, noise)
+    
+    routes = await plan_routes_ml_batch([
+        {
+            "origin_lat": origin_lat,
+            "origin_lng": origin_lng,
+            "dest_lat": dest_lat,
+            "dest_lng": dest_lng,
+            "route_type": route_type,
+            "issues": issues,
+            "traffic": traffic,
+            "noise": noise,
+            "time_of_day": time_of_day,
+            "weather": weather,
+            "context_summary": context_summary
+        }
+        for route_type in route_types
+    ])
+    return dict(zip(route_types, routes))
+
+
+async def _route_without_llm(
+    origin_lat: float,
+    origin_lng: float,
+    dest_lat: float,
+    dest_lng: float,
+    route_type: str,
+    distance_km: float,
+    issues: List[Dict],
+    traffic: List[Dict],
+    noise: List[Dict],
+    context_summary: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Street route (no Gemini refinement) with formula-based metrics, for routes that skip the LLM."""
+    path = await _generate_path(
+        origin_lat, origin_lng, dest_lat, dest_lng,
+        route_type, issues, refine=False
+    )
+    metrics_result = _fallback_metrics(distance_km, route_type, issues, traffic, noise, context_summary)
+    
+    return {
+        "route_type": route_type,
+        "path": _path_tuples(path),
+        "metrics": metrics_result['metrics'],
+        "explanation": metrics_result['explanation']
+    }
 
-    issues_to_avoid = []
 
+def _should_use_llm(
+    issues: List[Dict],
+    traffic: List[Dict],
+    noise: List[Dict],
+    weather: Optional[str],
+    llm_policy: str = "auto"
+) -> bool:
+    """
+    Whether a route is worth a Gemini round-trip.
+    With no issues, traffic, noise or weather the prediction has nothing to
+    reason about beyond distance, which the formula fallback covers.
+    """
+    if llm_policy != "auto":
+        return llm_policy == "always"
+    return bool(issues or traffic or noise or weather)
+
+
+def _route_cache_key(
+    origin_lat: float,
+    origin_lng: float,
+    dest_lat: float,
+    dest_lng: float,
+    route_type: str,
+    time_of_day: Optional[datetime],
+    weather: Optional[str]
+) -> Tuple:
+    """Quantize route inputs so nearby requests in the same time window share a cache entry."""
+    hour_bucket = time_of_day.hour // ROUTE_CACHE_HOUR_BUCKET if time_of_day else None
+    weather_norm = (weather or "").strip().lower() or None
+    return (
+        round(origin_lat, ROUTE_CACHE_PRECISION),
+        round(origin_lng, ROUTE_CACHE_PRECISION),
+        round(dest_lat, ROUTE_CACHE_PRECISION),
+        round(dest_lng, ROUTE_CACHE_PRECISION),
+        route_type,
+        hour_bucket,
+        weather_norm
+    )
+
+
+def _route_for_endpoints(
+    route: Dict[str, Any],
+    origin_lat: float,
+    origin_lng: float,
+    dest_lat: float,
+    dest_lng: float
+) -> Dict[str, Any]:
+    """
+    Copy a cached route for a caller, so the cache entry can't be mutated.
+    Cache keys are quantized, so the stored path starts and ends at the first
+    requester's points; they are replaced with this request's exact endpoints.
+    """
+    path = list(route["path"])
+    path[0] = (round(origin_lat, 6), round(origin_lng, 6))
+    path[-1] = (round(dest_lat, 6), round(dest_lng, 6))
+    return {**route, "path": path, "metrics": dict(route["metrics"])}
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counts and occupancy of the route plan cache, plus street route cache occupancy."""
+    return {
+        "hits": _route_cache_hits,
+        "misses": _route_cache_misses,
+        "evictions": ROUTE_PLAN_CACHE.evictions,
+        **get_cache_stats(ROUTE_PLAN_CACHE),
+        "street_routes": get_cache_stats(STREET_ROUTE_CACHE)
+    }
+
+
+@dataclass
+class IssueArrays:
+    """Issues with coordinates as parallel arrays (one row per issue), built once per request."""
+
+    lat: np.ndarray
+    lng: np.ndarray
+    severity: np.ndarray      # NaN where the issue carries no severity
+    is_accident: np.ndarray   # issue_type mentions "accident"
+    is_crash: np.ndarray      # issue_type mentions "crash"
+    is_critical: np.ndarray   # priority == "critical"
+    is_high: np.ndarray       # priority == "high"
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def subset(self, mask: np.ndarray) -> "IssueArrays":
+        return IssueArrays(
+            self.lat[mask], self.lng[mask], self.severity[mask],
+            self.is_accident[mask], self.is_crash[mask],
+            self.is_critical[mask], self.is_high[mask]
+        )
+
+
+def _issues_to_soa(issues: List[Dict]) -> IssueArrays:
+    """Convert issue dicts to IssueArrays in one pass, skipping issues without coordinates."""
+    rows = []
     for issue in issues:
         if 'lat' not in issue or 'lng' not in issue:
             continue
-
-        severity = issue.get('severity', 0)
-        priority = issue.get('priority', '').lower()
         issue_type = issue.get('issue_type', '').lower()
+        priority = issue.get('priority', '').lower()
+        rows.append((
+            issue['lat'], issue['lng'], issue.get('severity', math.nan),
+            'accident' in issue_type, 'crash' in issue_type,
+            priority == 'critical', priority == 'high'
+        ))
+
+    if not rows:
+        empty = np.empty(0, dtype=np.float64)
+        no = np.empty(0, dtype=bool)
+        return IssueArrays(empty, empty, empty, no, no, no, no)
+
+    lat, lng, severity, is_accident, is_crash, is_critical, is_high = zip(*rows)
+    return IssueArrays(
+        np.array(lat, dtype=np.float64),
+        np.array(lng, dtype=np.float64),
+        np.array(severity, dtype=np.float64),
+        np.array(is_accident, dtype=bool),
+        np.array(is_crash, dtype=bool),
+        np.array(is_critical, dtype=bool),
+        np.array(is_high, dtype=bool)
+    )
 
-        # ALWAYS avoid accidents regardless of route type (safety first)
-        is_accident = 'accident' in issue_type or 'crash' in issue_type or priority == 'critical'
 
-        should_avoid = False
+def _issues_to_avoid(issues: IssueArrays, route_type: str) -> IssueArrays:
+    """
+    Issues a route of this type should steer around.
+    Missing severities are NaN, so they never pass a severity threshold.
+    """
+    # ALWAYS avoid accidents regardless of route type (safety first)
+    avoid = issues.is_accident | issues.is_crash | issues.is_critical
 
-        if is_accident:
-            # Accidents are ALWAYS avoided on all route types
-            should_avoid = True
-        elif route_type == 'drive':
+    with np.errstate(invalid='ignore'):
+        if route_type == 'drive':
             # Drive routes avoid high and medium-high severity (red and orange zones)
-            should_avoid = severity > 0.6 or priority in ['high', 'critical']
+            avoid |= (issues.severity > 0.6) | issues.is_high
         elif route_type == 'eco':
             # Eco routes avoid high severity areas
-            should_avoid = severity > 0.7 or priority == 'critical'
+            avoid |= issues.severity > 0.7
         elif route_type == 'quiet_walk':
             # Quiet walk routes avoid medium-high severity
-            should_avoid = severity > 0.5 or priority in ['high', 'critical']
+            avoid |= (issues.severity > 0.5) | issues.is_high
 
-        if should_avoid:
-            issues_to_avoid.append(issue)
+    return issues.subset(avoid)
 
-    logger.info(f"Route type '{route_type}': Avoiding {len(issues_to_avoid)} issues out of {len(issues)} total")
+
+async def generate_path_ml(
+    origin_lat: float,
+    origin_lng: float,
+    dest_lat: float,
+    dest_lng: float,
+    route_type: str,
+    issues: List[Dict]
+) -> List[Dict[str, float]]:
+    """
+    Generate realistic waypoints that follow actual streets and avoid high-severity issues.
+    Uses OpenRouteService for real street-based routing, then adjusts to avoid issues.
     
+    Returns:
+        List of {lat, lng} waypoints
+    """
+    path = await _generate_path(origin_lat, origin_lng, dest_lat, dest_lng, route_type, issues)
+    return [{"lat": lat, "lng": lng} for lat, lng in path.tolist()]
+
+
+def _path_tuples(path: np.ndarray) -> List[Tuple[float, float]]:
+    """(lat, lng) tuples for the route response schema, at 6 decimals (~0.1m)."""
+    return list(map(tuple, np.round(path, 6).tolist()))
+
+
+def _with_endpoints(
+    path: np.ndarray,
+    origin_lat: float,
+    origin_lng: float,
+    dest_lat: float,
+    dest_lng: float
+) -> np.ndarray:
+    """Copy of an (N, 2) path with its first and last rows set to the exact endpoints."""
+    path = path.copy()
+    path[0] = (origin_lat, origin_lng)
+    path[-1] = (dest_lat, dest_lng)
+    return path
+
+
+async def _generate_path(
+    origin_lat: float,
+    origin_lng: float,
+    dest_lat: float,
+    dest_lng: float,
+    route_type: str,
+    issues: List[Dict],
+    refine: bool = True
+) -> np.ndarray:
+    """
+    generate_path_ml's implementation.
+    Paths are (N, 2) float64 arrays of (lat, lng) rows throughout the service.
+    With refine=False the fallback path is never sent to Gemini.
+    """
+    issue_arrays = _issues_to_soa(issues)
+
     # First, try to get real street route from OpenRouteService or OSRM
     street_path = await _get_street_route_ors(
         origin_lat, origin_lng, dest_lat, dest_lng, route_type
     )
 
-    if street_path and len(street_path) >= 2:
+    if street_path is not None and len(street_path) >= 2:
         # We have a real street route, check if it needs adjustment for critical issues
-        # Note: We preserve the street route as-is to keep it on actual streets
-        adjusted_path = _adjust_path_around_issues(street_path, issues_to_avoid, route_type)
+        # Note: We preserve the street route as-is to keep it on actual streets.
+        # Critical issues are avoided on every route type, so the route-type filter is skipped here
+        adjusted_path = _adjust_path_around_issues(street_path, issue_arrays, route_type)
         logger.info(
             f"Using street route (OSRM/OpenRouteService) with {len(adjusted_path)} waypoints. "
             f"Route follows actual streets."
         )
         return adjusted_path
 
+    # Filter issues to avoid based on route type and severity
+    # For drive routes: avoid accidents (critical priority) and high severity (> 0.6)
+    # For eco routes: avoid high severity issues (> 0.7)
+    # For quiet_walk: avoid medium-high severity (> 0.5)
+    issues_to_avoid = _issues_to_avoid(issue_arrays, route_type)
+
+    logger.info(f"Route type '{route_type}': Avoiding {len(issues_to_avoid)} issues out of {len(issues)} total")
+
     # Fallback: Use smart path generation that avoids issues
     # WARNING: This path does NOT follow actual streets, only approximates a route
     logger.warning(
@@ -184,56 +620,55 @@ async def generate_path_ml(
         issues_to_avoid, route_type
     )
     
-    # Try ML enhancement if model is available
-    if model:
+    # Try ML enhancement if model is available and there is something to route around;
+    # without issues the smart path is already a smooth curve and Gemini adds only latency
+    if (
+        model
+        and refine
+        and settings.ML_PATH_REFINEMENT_ENABLED
+        and len(issues_to_avoid) >= ML_PATH_REFINEMENT_MIN_ISSUES
+    ):
         try:
             # Build issue context for ML
             issue_context = ""
-            if issues_to_avoid:
+            if len(issues_to_avoid):
                 issue_list = [
-                    f"({i['lat']:.4f}, {i['lng']:.4f})"
-                    for i in issues_to_avoid[:5]  # Limit to 5 for prompt size
+                    f"({lat:.4f}, {lng:.4f})"
+                    for lat, lng in zip(issues_to_avoid.lat[:5], issues_to_avoid.lng[:5])  # Limit to 5 for prompt size
                 ]
                 issue_context = f"\nAVOID these issue locations: {', '.join(issue_list)}"
             
-            prompt = f"""You are a navigation system. Refine this route to follow realistic street patterns.
+            prompt = _PATH_PROMPT_TEMPLATE.format(
+                origin_lat=origin_lat,
+                origin_lng=origin_lng,
+                dest_lat=dest_lat,
+                dest_lng=dest_lng,
+                route_type=route_type,
+                num_waypoints=len(path),
+                issue_context=issue_context
+            )
 
-Origin: ({origin_lat:.6f}, {origin_lng:.6f})
-Destination: ({dest_lat:.6f}, {dest_lng:.6f})
-Route Type: {route_type}
-Current Waypoints: {len(path)} points{issue_context}
-
-Refine the route to:
-1. Follow realistic road patterns (not straight lines)
-2. Create smooth curves and turns
-3. Avoid the issue locations listed above
-4. Add 2-4 intermediate waypoints for realistic navigation
-
-Respond with ONLY a JSON object:
-{{"waypoints": [{{"lat": 40.7128, "lng": -74.0060}}, {{"lat": 40.7150, "lng": -74.0050}}, ...]}}"""
-
-            response = model.generate_content(prompt)
+            response = await model.generate_content_async(prompt)
             text = response.text.strip()
             
-            # Extract JSON
-            json_match = re.search(r'\{[^}]*"waypoints"[^}]*\[.*?\]\s*\}', text, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group())
+            result = _extract_json_object(text, 'waypoints')
+            if result:
                 ml_waypoints = result.get('waypoints', [])
                 
                 # Validate and use ML waypoints if valid
                 if ml_waypoints and len(ml_waypoints) >= 2:
-                    # Ensure start and end are correct
-                    ml_waypoints[0] = {"lat": origin_lat, "lng": origin_lng}
-                    ml_waypoints[-1] = {"lat": dest_lat, "lng": dest_lng}
+                    # Exact endpoints around the well-formed interior points
+                    coords = np.array(
+                        [(origin_lat, origin_lng)]
+                        + [(wp['lat'], wp['lng']) for wp in ml_waypoints[1:-1]
+                           if isinstance(wp, dict) and 'lat' in wp and 'lng' in wp]
+                        + [(dest_lat, dest_lng)],
+                        dtype=np.float64
+                    )
                     
-                    # Validate all coordinates
-                    valid_waypoints = []
-                    for wp in ml_waypoints:
-                        if isinstance(wp, dict) and 'lat' in wp and 'lng' in wp:
-                            lat, lng = float(wp['lat']), float(wp['lng'])
-                            if -90 <= lat <= 90 and -180 <= lng <= 180:
-                                valid_waypoints.append({"lat": lat, "lng": lng})
+                    # Validate all coordinates in one pass (NaN fails both comparisons)
+                    in_bounds = (np.abs(coords[:, 0]) <= 90) & (np.abs(coords[:, 1]) <= 180)
+                    valid_waypoints = coords[in_bounds]
                     
                     if len(valid_waypoints) >= 2:
                         logger.info(f"ML refined route to {len(valid_waypoints)} waypoints")
@@ -246,6 +681,83 @@ Respond with ONLY a JSON object:
     return path
 
 
+def _field_mean(items: List[Dict], field: str, default: float, empty: float) -> float:
+    """Mean of one numeric field across dicts (missing values count as default); empty if no items."""
+    if not items:
+        return empty
+    values = np.fromiter((item.get(field, default) for item in items), dtype=float, count=len(items))
+    return float(values.mean())
+
+
+def _count_high_severity(issues: List[Dict]) -> int:
+    """Number of issues with severity above 0.7."""
+    severities = np.fromiter((i.get('severity', 0) for i in issues), dtype=float, count=len(issues))
+    return int(np.count_nonzero(severities > 0.7))
+
+
+def summarize_context(
+    issues: List[Dict],
+    traffic: List[Dict],
+    noise: List[Dict]
+) -> Dict[str, Any]:
+    """
+    Summary statistics of the city context used for metric prediction.
+    Compute once and pass as context_summary when planning several routes
+    against the same issues/traffic/noise data.
+    """
+    return {
+        "avg_traffic": _field_mean(traffic, 'congestion', 0, 0.3),
+        "avg_noise": _field_mean(noise, 'noise_db', 50, 50),
+        "high_severity_issues": _count_high_severity(issues),
+    }
+
+
+def _metrics_context(time_of_day: Optional[datetime], summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Route context the metrics prompt is built from."""
+    hour_str = time_of_day.strftime("%H:%M %A") if time_of_day else "Unknown"
+    is_rush_hour = False
+    if time_of_day:
+        hour = time_of_day.hour
+        is_rush_hour = (7 <= hour <= 9) or (17 <= hour <= 19)
+    
+    return {
+        "hour_str": hour_str,
+        "is_rush_hour": is_rush_hour,
+        **summary
+    }
+
+
+def _metrics_prompt(distance_km: float, route_type: str, weather: Optional[str], context: Dict[str, Any]) -> str:
+    """Build the Gemini prompt for route metric prediction."""
+    return _METRICS_PROMPT_TEMPLATE.format(
+        distance_km=distance_km,
+        route_type=route_type,
+        hour_str=context['hour_str'],
+        rush_hour="(RUSH HOUR)" if context['is_rush_hour'] else "",
+        weather=weather or "Normal conditions",
+        avg_traffic=context['avg_traffic'],
+        avg_noise=context['avg_noise'],
+        high_severity_issues=context['high_severity_issues']
+    )
+
+
+def _build_metrics(result: Dict[str, Any], distance_km: float, route_type: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Route metrics from parsed Gemini output, with defaults for missing fields."""
+    metrics = {
+        "distance_km": round(distance_km, 2),
+        "eta_minutes": round(result.get('eta_minutes', 20), 1),
+    }
+    
+    if route_type in ['drive', 'eco']:
+        metrics["co2_kg"] = round(result.get('co2_kg', distance_km * 0.15), 2)
+        metrics["congestion_score"] = round(result.get('congestion_score', context['avg_traffic']), 2)
+    
+    if route_type == 'quiet_walk':
+        metrics["avg_noise_db"] = round(result.get('avg_noise_db', context['avg_noise']), 1)
+    
+    return metrics
+
+
 async def predict_route_metrics_ml(
     distance_km: float,
     route_type: str,
@@ -253,81 +765,30 @@ async def predict_route_metrics_ml(
     issues: List[Dict],
     traffic: List[Dict],
     noise: List[Dict],
-    weather: Optional[str]
+    weather: Optional[str],
+    context_summary: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Use ML to predict realistic ETA, CO2, and route quality.
     Considers all contextual factors instead of hardcoded formulas.
+    context_summary is summarize_context(issues, traffic, noise), computed here if not given.
     """
+    if context_summary is None:
+        context_summary = summarize_context(issues, traffic, noise)
+    
     if not model:
-        return _fallback_metrics(distance_km, route_type, issues, traffic, noise)
+        return _fallback_metrics(distance_km, route_type, issues, traffic, noise, context_summary)
     
     try:
-        # Prepare context
-        hour_str = time_of_day.strftime("%H:%M %A") if time_of_day else "Unknown"
-        is_rush_hour = False
-        if time_of_day:
-            hour = time_of_day.hour
-            is_rush_hour = (7 <= hour <= 9) or (17 <= hour <= 19)
-        
-        avg_traffic = sum(t.get('congestion', 0) for t in traffic) / len(traffic) if traffic else 0.3
-        avg_noise = sum(n.get('noise_db', 50) for n in noise) / len(noise) if noise else 50
-        high_severity_issues = sum(1 for i in issues if i.get('severity', 0) > 0.7)
-        
-        prompt = f"""You are a transportation analytics AI. Predict realistic route metrics.
-
-Distance: {distance_km:.2f} km
-Route Type: {route_type}
-Time: {hour_str} {"(RUSH HOUR)" if is_rush_hour else ""}
-Weather: {weather or "Normal conditions"}
-Average Traffic Congestion: {avg_traffic:.2f} (0-1 scale)
-Average Noise Level: {avg_noise:.1f} dB
-High-Severity Issues on Route: {high_severity_issues}
-
-Predict realistic metrics for this route:
-
-For "drive" route:
-- ETA (minutes): Consider traffic, time of day, issues
-- CO2 emissions (kg): Based on distance, traffic (more idle = more CO2)
-
-For "eco" route:
-- ETA (minutes): Slightly longer than drive (avoids congestion)
-- CO2 emissions (kg): 20-30% less than regular drive
-
-For "quiet_walk" route:
-- ETA (minutes): Walking pace ~5 km/h
-- Average noise encountered (dB)
-
-Provide reasoning for your predictions.
-
-Respond with ONLY this JSON format:
-{{
-  "eta_minutes": 25,
-  "co2_kg": 1.8,
-  "avg_noise_db": 52.5,
-  "congestion_score": 0.65,
-  "reasoning": "Rush hour traffic adds 30% to base ETA. High congestion increases CO2 by 20%."
-}}"""
+        context = _metrics_context(time_of_day, context_summary)
+        prompt = _metrics_prompt(distance_km, route_type, weather, context)
 
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt, generation_config=_METRICS_GENERATION_CONFIG)
         text = response.text.strip()
         
-        json_match = re.search(r'\{[^{]*"eta_minutes"[^}]*\}', text, re.DOTALL)
-        if json_match:
-            result = json.loads(json_match.group())
-            
-            metrics = {
-                "distance_km": round(distance_km, 2),
-                "eta_minutes": round(result.get('eta_minutes', 20), 1),
-            }
-            
-            if route_type in ['drive', 'eco']:
-                metrics["co2_kg"] = round(result.get('co2_kg', distance_km * 0.15), 2)
-                metrics["congestion_score"] = round(result.get('congestion_score', avg_traffic), 2)
-            
-            if route_type == 'quiet_walk':
-                metrics["avg_noise_db"] = round(result.get('avg_noise_db', avg_noise), 1)
-            
+        result = _extract_json_object(text, 'eta_minutes')
+        if result:
+            metrics = _build_metrics(result, distance_km, route_type, context)
             explanation = result.get('reasoning', 'Route calculated with current conditions')
             
             logger.info(f"ML predicted ETA: {metrics['eta_minutes']} min - {explanation}")
@@ -338,11 +799,142 @@ Respond with ONLY this JSON format:
             }
         else:
             logger.warning("Could not parse ML metrics, using fallback")
-            return _fallback_metrics(distance_km, route_type, issues, traffic, noise)
+            return _fallback_metrics(distance_km, route_type, issues, traffic, noise, context_summary)
             
     except Exception as e:
         logger.error(f"Error predicting route metrics: {e}")
-        return _fallback_metrics(distance_km, route_type, issues, traffic, noise)
+        return _fallback_metrics(distance_km, route_type, issues, traffic, noise, context_summary)
+
+
+# Streaming metrics: numbers come before "reasoning" in the requested JSON
+_METRIC_FIELD_RE = re.compile(r'"(eta_minutes|co2_kg|avg_noise_db|congestion_score)"\s*:\s*(-?\d+(?:\.\d+)?)')
+_REASONING_START_RE = re.compile(r'"reasoning"\s*:\s*"')
+
+
+def _partial_reasoning(text: str, start: int) -> str:
+    """Decode the reasoning string received so far, starting just after its opening quote."""
+    i = start
+    while i < len(text):
+        if text[i] == '\\':
+            i += 2
+            continue
+        if text[i] == '"':
+            return _JSON_DECODER.decode(f'"{text[start:i]}"')
+        i += 1
+    # Hold back a trailing escape sequence until it is complete
+    raw = text[start:]
+    backslash = raw.rfind('\\')
+    if backslash != -1 and len(raw) - backslash < 6:
+        raw = raw[:backslash]
+    try:
+        return _JSON_DECODER.decode(f'"{raw}"')
+    except ValueError:
+        return ""
+
+
+async def _stream_gemini_text(prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """Yield Gemini response text chunks as they arrive."""
+    response = await model.generate_content_async(prompt, generation_config=generation_config, stream=True)
+    async for chunk in response:
+        yield chunk.text
+
+
+async def plan_route_ml_stream(
+    origin_lat: float,
+    origin_lng: float,
+    dest_lat: float,
+    dest_lng: float,
+    route_type: str,
+    issues: List[Dict] = None,
+    traffic: List[Dict] = None,
+    noise: List[Dict] = None,
+    time_of_day: Optional[datetime] = None,
+    weather: Optional[str] = None,
+    context_summary: Optional[Dict[str, Any]] = None,
+    llm_policy: Literal["auto", "always", "never"] = "auto"
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of plan_route_ml.
+    Metrics are yielded as soon as Gemini has produced them, then the
+    explanation as it is generated, then the path.
+    
+    Yields (in order):
+        {"metrics": {...}}
+        {"explanation_delta": str} (zero or more)
+        {"route_type": str, "path": [...], "explanation": str}
+    """
+    issues = issues or []
+    traffic = traffic or []
+    noise = noise or []
+    
+    distance_km = haversine_distance(origin_lat, origin_lng, dest_lat, dest_lng)
+    if context_summary is None:
+        context_summary = summarize_context(issues, traffic, noise)
+    
+    if not model or not _should_use_llm(issues, traffic, noise, weather, llm_policy):
+        if not model:
+            route = _fallback_route(
+                origin_lat, origin_lng, dest_lat, dest_lng,
+                route_type, distance_km, issues, traffic, noise, context_summary
+            )
+        else:
+            route = await _route_without_llm(
+                origin_lat, origin_lng, dest_lat, dest_lng,
+                route_type, distance_km, issues, traffic, noise, context_summary
+            )
+        yield {"metrics": route["metrics"]}
+        yield {"route_type": route_type, "path": route["path"], "explanation": route["explanation"]}
+        return
+    
+    # The path needs the whole Gemini response, so it is generated alongside the metrics stream
+    path_task = asyncio.ensure_future(_generate_path(
+        origin_lat, origin_lng, dest_lat, dest_lng,
+        route_type, issues
+    ))
+    try:
+        context = _metrics_context(time_of_day, context_summary)
+        prompt = _metrics_prompt(distance_km, route_type, weather, context)
+        
+        text = ""
+        metrics = None
+        reasoning_start = None
+        sent = ""
+        try:
+            async for chunk in _stream_gemini_text(prompt, _METRICS_GENERATION_CONFIG):
+                text += chunk
+                if reasoning_start is None:
+                    match = _REASONING_START_RE.search(text)
+                    if not match:
+                        if len(text) > MAX_RESPONSE_CHARS:
+                            break
+                        continue
+                    reasoning_start = match.end()
+                    result = {name: float(value) for name, value in _METRIC_FIELD_RE.findall(text[:match.start()])}
+                    metrics = _build_metrics(result, distance_km, route_type, context)
+                    yield {"metrics": metrics}
+                
+                reasoning = _partial_reasoning(text, reasoning_start)
+                if len(reasoning) > len(sent):
+                    yield {"explanation_delta": reasoning[len(sent):]}
+                    sent = reasoning
+        except Exception as e:
+            logger.error(f"Error streaming route metrics: {e}")
+        
+        if metrics is None:
+            logger.warning("Could not parse streamed ML metrics, using fallback")
+            fallback = _fallback_metrics(distance_km, route_type, issues, traffic, noise, context_summary)
+            metrics, sent = fallback["metrics"], fallback["explanation"]
+            yield {"metrics": metrics}
+            yield {"explanation_delta": sent}
+        
+        path = await path_task
+        yield {
+            "route_type": route_type,
+            "path": _path_tuples(path),
+            "explanation": sent or 'Route calculated with current conditions'
+        }
+    finally:
+        path_task.cancel()
 
 
 async def _get_street_route_ors(
@@ -351,70 +943,138 @@ async def _get_street_route_ors(
     dest_lat: float,
     dest_lng: float,
     route_type: str
-) -> Optional[List[Dict[str, float]]]:
+) -> Optional[np.ndarray]:
     """
-    Get real street-based route from OpenRouteService or OSRM.
-    Returns list of waypoints following actual roads.
+    Get real street-based route from OpenRouteService or OSRM, cached by rounded endpoints.
+    Returns (N, 2) array of (lat, lng) waypoints following actual roads.
     """
-    # Try OpenRouteService first (if API key is available)
+    cache_key = (
+        round(origin_lat, STREET_ROUTE_CACHE_PRECISION),
+        round(origin_lng, STREET_ROUTE_CACHE_PRECISION),
+        round(dest_lat, STREET_ROUTE_CACHE_PRECISION),
+        round(dest_lng, STREET_ROUTE_CACHE_PRECISION),
+        route_type
+    )
+    waypoints = STREET_ROUTE_CACHE.get(cache_key)
+    if waypoints is None:
+        fetch = _street_route_inflight.get(cache_key)
+        if fetch is None:
+            fetch = asyncio.ensure_future(
+                _fetch_street_route(origin_lat, origin_lng, dest_lat, dest_lng, route_type)
+            )
+            _street_route_inflight[cache_key] = fetch
+            fetch.add_done_callback(lambda _: _street_route_inflight.pop(cache_key, None))
+        # Shielded so one caller being cancelled doesn't cancel the fetch for the others
+        waypoints = await asyncio.shield(fetch)
+        if waypoints is None:
+            return None
+        STREET_ROUTE_CACHE[cache_key] = waypoints
+    
+    # Endpoints are always the exact requested coordinates
+    return _with_endpoints(waypoints, origin_lat, origin_lng, dest_lat, dest_lng)
+
+
+async def _fetch_street_route(
+    origin_lat: float,
+    origin_lng: float,
+    dest_lat: float,
+    dest_lng: float,
+    route_type: str
+) -> Optional[np.ndarray]:
+    """
+    Request a street-based route from OpenRouteService (if configured) and OSRM concurrently.
+    Returns the first successful (N, 2) array of waypoints following actual roads.
+    """
+    args = (origin_lat, origin_lng, dest_lat, dest_lng, route_type)
+    pending = {asyncio.ensure_future(_fetch_osrm_route(*args))}
     if settings.OPENROUTESERVICE_API_KEY:
-        try:
-            # Map route types to OpenRouteService profiles
-            profile_map = {
-                "drive": "driving-car",
-                "eco": "driving-eco",  # More fuel-efficient route
-                "quiet_walk": "foot-walking"
-            }
-            profile = profile_map.get(route_type, "driving-car")
-            
-            # OpenRouteService API endpoint
-            url = f"https://api.openrouteservice.org/v2/directions/{profile}"
-            
-            # Request body
-            body = {
-                "coordinates": [[origin_lng, origin_lat], [dest_lng, dest_lat]],
-                "geometry": True,
-                "format": "geojson"
+        pending.add(asyncio.ensure_future(_fetch_ors_route(*args)))
+    
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                waypoints = task.result()
+                if waypoints is not None:
+                    return waypoints
+    finally:
+        for task in pending:
+            task.cancel()
+    
+    return None
+
+
+async def _fetch_ors_route(
+    origin_lat: float,
+    origin_lng: float,
+    dest_lat: float,
+    dest_lng: float,
+    route_type: str
+) -> Optional[np.ndarray]:
+    """Street route from OpenRouteService, or None if unavailable."""
+    try:
+        # Map route types to OpenRouteService profiles
+        profile_map = {
+            "drive": "driving-car",
+            "eco": "driving-eco",  # More fuel-efficient route
+            "quiet_walk": "foot-walking"
+        }
+        profile = profile_map.get(route_type, "driving-car")
+        
+        # OpenRouteService API endpoint
+        url = f"https://api.openrouteservice.org/v2/directions/{profile}"
+        
+        # Request body
+        body = {
+            "coordinates": [[origin_lng, origin_lat], [dest_lng, dest_lat]],
+            "geometry": True,
+            "format": "geojson"
+        }
+        
+        response = await _get_client().post(
+            url,
+            json=body,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {settings.OPENROUTESERVICE_API_KEY}"
             }
+        )
+        
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
             
-            # Make request with timeout
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    url,
-                    json=body,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {settings.OPENROUTESERVICE_API_KEY}"
-                    }
-                )
+            # Extract coordinates from GeoJSON
+            if "features" in data and len(data["features"]) > 0:
+                geometry = data["features"][0].get("geometry", {})
+                coordinates = geometry.get("coordinates", [])
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    # Extract coordinates from GeoJSON
-                    if "features" in data and len(data["features"]) > 0:
-                        geometry = data["features"][0].get("geometry", {})
-                        coordinates = geometry.get("coordinates", [])
-                        
-                        # Convert from [lng, lat] to [lat, lng] format
-                        waypoints = [
-                            {"lat": coord[1], "lng": coord[0]}
-                            for coord in coordinates
-                        ]
-                        
-                        # Ensure start and end are exact
-                        if waypoints:
-                            waypoints[0] = {"lat": origin_lat, "lng": origin_lng}
-                            waypoints[-1] = {"lat": dest_lat, "lng": dest_lng}
-                        
-                        logger.info(f"OpenRouteService returned {len(waypoints)} waypoints")
-                        return waypoints
+                if len(coordinates) < 2:
+                    logger.warning(f"OpenRouteService returned invalid geometry with {len(coordinates)} coordinates")
                 else:
-                    logger.warning(f"OpenRouteService returned status {response.status_code}")
-        except Exception as e:
-            logger.warning(f"OpenRouteService error: {e}")
+                    # Convert from [lng, lat] to [lat, lng] format, ensuring start and end are exact
+                    waypoints = _with_endpoints(
+                        np.asarray(coordinates, dtype=np.float64)[:, 1::-1],
+                        origin_lat, origin_lng, dest_lat, dest_lng
+                    )
+                    
+                    logger.info(f"OpenRouteService returned {len(waypoints)} waypoints")
+                    return waypoints
+        else:
+            logger.warning(f"OpenRouteService returned status {response.status_code}")
+    except Exception as e:
+        logger.warning(f"OpenRouteService error: {e}")
     
-    # Fallback to OSRM (public instance, no API key needed)
+    return None
+
+
+async def _fetch_osrm_route(
+    origin_lat: float,
+    origin_lng: float,
+    dest_lat: float,
+    dest_lng: float,
+    route_type: str
+) -> Optional[np.ndarray]:
+    """Street route from OSRM (public instance, no API key needed), or None if unavailable."""
     try:
         # Map route types to OSRM profiles
         profile_map = {
@@ -432,38 +1092,32 @@ async def _get_street_route_ors(
             "steps": "false"
         }
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, params=params)
+        response = await _get_client().get(url, params=params)
+        
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
             
-            if response.status_code == 200:
-                data = response.json()
+            # Extract coordinates from OSRM response
+            if "routes" in data and len(data["routes"]) > 0:
+                geometry = data["routes"][0].get("geometry", {})
+                coordinates = geometry.get("coordinates", [])
                 
-                # Extract coordinates from OSRM response
-                if "routes" in data and len(data["routes"]) > 0:
-                    geometry = data["routes"][0].get("geometry", {})
-                    coordinates = geometry.get("coordinates", [])
-                    
-                    if not coordinates or len(coordinates) < 2:
-                        logger.warning(f"OSRM returned invalid geometry with {len(coordinates) if coordinates else 0} coordinates")
-                    else:
-                        # Convert from [lng, lat] to [lat, lng] format
-                        waypoints = [
-                            {"lat": coord[1], "lng": coord[0]}
-                            for coord in coordinates
-                        ]
-                        
-                        # Ensure start and end are exact
-                        if waypoints:
-                            waypoints[0] = {"lat": origin_lat, "lng": origin_lng}
-                            waypoints[-1] = {"lat": dest_lat, "lng": dest_lng}
-                        
-                        logger.info(f"OSRM returned {len(waypoints)} waypoints for route from ({origin_lat:.4f}, {origin_lng:.4f}) to ({dest_lat:.4f}, {dest_lng:.4f})")
-                        return waypoints
+                if not coordinates or len(coordinates) < 2:
+                    logger.warning(f"OSRM returned invalid geometry with {len(coordinates) if coordinates else 0} coordinates")
                 else:
-                    logger.warning(f"OSRM response missing routes: {data.get('code', 'unknown')} - {data.get('message', 'no message')}")
+                    # Convert from [lng, lat] to [lat, lng] format, ensuring start and end are exact
+                    waypoints = _with_endpoints(
+                        np.asarray(coordinates, dtype=np.float64)[:, 1::-1],
+                        origin_lat, origin_lng, dest_lat, dest_lng
+                    )
+                    
+                    logger.info(f"OSRM returned {len(waypoints)} waypoints for route from ({origin_lat:.4f}, {origin_lng:.4f}) to ({dest_lat:.4f}, {dest_lng:.4f})")
+                    return waypoints
             else:
-                error_text = response.text[:200] if hasattr(response, 'text') else 'no error text'
-                logger.warning(f"OSRM returned status {response.status_code}: {error_text}")
+                logger.warning(f"OSRM response missing routes: {data.get('code', 'unknown')} - {data.get('message', 'no message')}")
+        else:
+            error_text = response.text[:200] if hasattr(response, 'text') else 'no error text'
+            logger.warning(f"OSRM returned status {response.status_code}: {error_text}")
     except httpx.TimeoutException:
         logger.warning("OSRM request timed out")
     except Exception as e:
@@ -473,27 +1127,24 @@ async def _get_street_route_ors(
 
 
 def _adjust_path_around_issues(
-    path: List[Dict[str, float]],
-    issues_to_avoid: List[Dict],
+    path: np.ndarray,
+    issues_to_avoid: IssueArrays,
     route_type: str
-) -> List[Dict[str, float]]:
+) -> np.ndarray:
     """
     Check if a street route passes too close to issues.
     If it does, return the original path (we can't adjust street routes without breaking them).
+    Only accidents and critical-priority issues are checked, so unfiltered issues may be passed.
     The route from OSRM/OpenRouteService already follows streets, so we should preserve it.
     """
-    if not issues_to_avoid or not path:
+    if not len(issues_to_avoid) or not len(path):
         return path
 
     # Check if route passes too close to critical issues (accidents)
     # For non-critical issues, we'll let the route pass through (it's on streets, which is safe)
-    critical_issues = [
-        issue for issue in issues_to_avoid
-        if 'accident' in issue.get('issue_type', '').lower() or 
-           issue.get('priority', '').lower() == 'critical'
-    ]
+    critical = issues_to_avoid.is_accident | issues_to_avoid.is_critical
     
-    if not critical_issues:
+    if not critical.any():
         # No critical issues, return original path
         return path
     
@@ -501,47 +1152,69 @@ def _adjust_path_around_issues(
     # Only flag if a waypoint is within 100m of an accident
     min_safe_distance = 0.1  # 100 meters
     
-    for waypoint in path:
-        lat = waypoint["lat"]
-        lng = waypoint["lng"]
-        
-        for issue in critical_issues:
-            issue_lat = issue.get('lat', 0)
-            issue_lng = issue.get('lng', 0)
-            dist = haversine_distance(lat, lng, issue_lat, issue_lng)
-            
-            if dist < min_safe_distance:
-                # Route passes very close to a critical issue
-                # Log a warning but return the original path
-                # The route is still on streets, which is safer than adjusting it off-street
-                logger.warning(
-                    f"Route passes within {dist*1000:.0f}m of critical issue at ({issue_lat:.4f}, {issue_lng:.4f}). "
-                    f"Keeping original street route."
-                )
-                # Return original path - it's better to have a route on streets even if near an issue
-                # than to adjust it off the streets
-                return path
-    
-    # Route doesn't pass too close to critical issues, return as-is
+    issue_coords = np.column_stack((issues_to_avoid.lat[critical], issues_to_avoid.lng[critical]))
+    close_pair = _first_close_pair(path, issue_coords, min_safe_distance)
+    
+    if close_pair is not None:
+        wp_idx, issue_idx = close_pair
+        issue_lat, issue_lng = issue_coords[issue_idx]
+        dist = haversine_distance(path[wp_idx, 0], path[wp_idx, 1], issue_lat, issue_lng)
+        # Route passes very close to a critical issue
+        # Log a warning but return the original path
+        # The route is still on streets, which is safer than adjusting it off-street
+        logger.warning(
+            f"Route passes within {dist*1000:.0f}m of critical issue at ({issue_lat:.4f}, {issue_lng:.4f}). "
+            f"Keeping original street route."
+        )
+    
+    # Street routes are returned as-is either way
     return path
 
 
+def _first_close_pair(
+    path: np.ndarray,
+    issue_coords: np.ndarray,
+    radius_km: float
+) -> Optional[Tuple[int, int]]:
+    """
+    (waypoint index, issue index) of the first waypoint in route order within
+    radius_km of an issue, or None. Both arguments are (N, 2) (lat, lng) arrays.
+    """
+    if cKDTree is not None and len(issue_coords) >= KD_TREE_MIN_ISSUES:
+        # Planar km coordinates around the route's mean latitude (accurate at this short range)
+        km_per_degree = 6371 * math.pi / 180
+        scale = np.array([km_per_degree, km_per_degree * math.cos(math.radians(path[:, 0].mean()))])
+        distances, nearest = cKDTree(issue_coords * scale).query(path * scale, distance_upper_bound=radius_km)
+        close = np.flatnonzero(np.isfinite(distances))
+        if close.size:
+            return int(close[0]), int(nearest[close[0]])
+        return None
+    
+    # Squared flat-earth distances from every waypoint (rows) to every issue (columns) in one pass
+    too_close = _flat_distance_sq(
+        path[:, 0:1], path[:, 1:2],
+        issue_coords[:, 0], issue_coords[:, 1]
+    ) < radius_km ** 2
+    if too_close.any():
+        wp_idx, issue_idx = np.unravel_index(np.argmax(too_close), too_close.shape)
+        return int(wp_idx), int(issue_idx)
+    return None
+
+
 def _generate_smart_path(
     origin_lat: float,
     origin_lng: float,
     dest_lat: float,
     dest_lng: float,
-    issues_to_avoid: List[Dict],
+    issues_to_avoid: Optional[IssueArrays],
     route_type: str,
     num_waypoints: int = 5
-) -> List[Dict[str, float]]:
+) -> np.ndarray:
     """
     Generate a smart path that avoids issues and follows realistic patterns.
     Creates waypoints that curve around problem areas.
     Avoidance strength varies by route type and issue severity.
     """
-    waypoints = []
-
     # Calculate base direction vector
     dlat = dest_lat - origin_lat
     dlng = dest_lng - origin_lng
@@ -562,65 +1235,73 @@ def _generate_smart_path(
         'quiet_walk': 0.5    # 500m - walking routes can navigate closer
     }.get(route_type, 0.7)
 
-    # Generate waypoints with avoidance logic
-    for i in range(num_waypoints + 1):
-        t = i / num_waypoints
-
-        # Base position along straight line
-        base_lat = origin_lat + dlat * t
-        base_lng = origin_lng + dlng * t
-
-        # Calculate avoidance offset for issues
-        avoid_offset_lat = 0
-        avoid_offset_lng = 0
-
-        for issue in issues_to_avoid:
-            issue_lat = issue.get('lat', 0)
-            issue_lng = issue.get('lng', 0)
-            issue_severity = issue.get('severity', 0.5)
-            is_accident = 'accident' in issue.get('issue_type', '').lower()
-
-            # Distance from current point to issue
-            dist_to_issue = haversine_distance(base_lat, base_lng, issue_lat, issue_lng)
-
-            # If issue is within avoidance radius, push route away
-            if dist_to_issue < avoidance_radius:
-                # Calculate direction away from issue
-                issue_dlat = base_lat - issue_lat
-                issue_dlng = base_lng - issue_lng
-                issue_dist = math.sqrt(issue_dlat**2 + issue_dlng**2)
-
-                if issue_dist > 0:
-                    # Calculate push strength based on:
-                    # 1. Distance (closer = stronger)
-                    # 2. Severity (higher = stronger)
-                    # 3. Type (accidents = much stronger)
-                    distance_factor = (avoidance_radius - dist_to_issue) / avoidance_radius
-                    severity_multiplier = 1.0 + issue_severity  # 1.0 to 2.0
-                    accident_multiplier = 4.0 if is_accident else 1.0
-
-                    # Base push: 0.008 degrees (~800m max)
-                    # With multipliers: up to 0.064 degrees (~7km) for very close accidents
-                    base_push = 0.008
-                    push_strength = base_push * distance_factor * severity_multiplier * accident_multiplier
-
-                    avoid_offset_lat += (issue_dlat / issue_dist) * push_strength
-                    avoid_offset_lng += (issue_dlng / issue_dist) * push_strength
-        
-        # Add realistic curve (sine wave pattern for street-like curves)
-        curve_strength = 0.002  # ~200m curve
-        perpendicular_lat = -dlng_norm * math.sin(t * math.pi) * curve_strength
-        perpendicular_lng = dlat_norm * math.sin(t * math.pi) * curve_strength
-        
-        # Combine base position, avoidance, and curve
-        final_lat = base_lat + avoid_offset_lat + perpendicular_lat
-        final_lng = base_lng + avoid_offset_lng + perpendicular_lng
-        
-        waypoints.append({"lat": round(final_lat, 6), "lng": round(final_lng, 6)})
+    # Base positions along the straight line, all waypoints at once
+    t = np.linspace(0.0, 1.0, num_waypoints + 1)
+    base_lat = origin_lat + dlat * t
+    base_lng = origin_lng + dlng * t
+
+    # Avoidance offsets from every issue for every waypoint (waypoints x issues)
+    avoid_offset_lat = np.zeros_like(t)
+    avoid_offset_lng = np.zeros_like(t)
+
+    if issues_to_avoid is not None and len(issues_to_avoid):
+        issue_lats = issues_to_avoid.lat
+        issue_lngs = issues_to_avoid.lng
+        issue_severities = np.nan_to_num(issues_to_avoid.severity, nan=0.5)
+        is_accident = issues_to_avoid.is_accident
+
+        # Offsets from each issue to each waypoint in degrees (the direction away from the issue)
+        issue_dlat = base_lat[:, None] - issue_lats
+        issue_dlng = base_lng[:, None] - issue_lngs
+        issue_dist_sq = issue_dlat * issue_dlat + issue_dlng * issue_dlng
+
+        # Flat-earth distance in km from the same offsets (short range, so this is accurate)
+        km_per_degree = 6371 * math.pi / 180
+        dlng_scaled = issue_dlng * np.cos(np.radians(base_lat))[:, None]
+        dist_sq_km = km_per_degree ** 2 * (issue_dlat * issue_dlat + dlng_scaled * dlng_scaled)
+
+        # Only issues within the avoidance radius push the route away;
+        # thresholds compare squares, so roots are only taken for those pairs
+        pushing = (dist_sq_km < avoidance_radius ** 2) & (issue_dist_sq > 0)
+        dist_to_issue = np.sqrt(dist_sq_km, out=np.zeros_like(dist_sq_km), where=pushing)
+        issue_dist = np.sqrt(issue_dist_sq, out=np.ones_like(issue_dist_sq), where=pushing)
+
+        # Push strength based on:
+        # 1. Distance (closer = stronger)
+        # 2. Severity (higher = stronger)
+        # 3. Type (accidents = much stronger)
+        distance_factor = (avoidance_radius - dist_to_issue) / avoidance_radius
+        severity_multiplier = 1.0 + issue_severities  # 1.0 to 2.0
+        accident_multiplier = np.where(is_accident, 4.0, 1.0)
+
+        # Base push: 0.008 degrees (~800m max)
+        # With multipliers: up to 0.064 degrees (~7km) for very close accidents
+        base_push = 0.008
+        push_strength = np.where(
+            pushing,
+            base_push * distance_factor * severity_multiplier * accident_multiplier,
+            0.0
+        )
+        scale = push_strength / issue_dist
+
+        avoid_offset_lat = (issue_dlat * scale).sum(axis=1)
+        avoid_offset_lng = (issue_dlng * scale).sum(axis=1)
+
+    # Add realistic curve (sine wave pattern for street-like curves)
+    curve_strength = 0.002  # ~200m curve
+    curve = np.sin(t * np.pi) * curve_strength
+    perpendicular_lat = -dlng_norm * curve
+    perpendicular_lng = dlat_norm * curve
+
+    # Combine base position, avoidance, and curve
+    waypoints = np.round(np.column_stack((
+        base_lat + avoid_offset_lat + perpendicular_lat,
+        base_lng + avoid_offset_lng + perpendicular_lng
+    )), 6)
     
     # Ensure start and end are exact
-    waypoints[0] = {"lat": origin_lat, "lng": origin_lng}
-    waypoints[-1] = {"lat": dest_lat, "lng": dest_lng}
+    waypoints[0] = (origin_lat, origin_lng)
+    waypoints[-1] = (dest_lat, dest_lng)
     
     return waypoints
 
@@ -631,12 +1312,12 @@ def _generate_simple_path(
     dest_lat: float,
     dest_lng: float,
     num_waypoints: int = 3
-) -> List[Dict[str, float]]:
+) -> np.ndarray:
     """Generate simple interpolated path as fallback (legacy, use _generate_smart_path instead)."""
-    return _generate_smart_path(origin_lat, origin_lng, dest_lat, dest_lng, [], 'drive', num_waypoints)
+    return _generate_smart_path(origin_lat, origin_lng, dest_lat, dest_lng, None, 'drive', num_waypoints)
 
 
-async def _fallback_route(
+def _fallback_route(
     origin_lat: float,
     origin_lng: float,
     dest_lat: float,
@@ -645,40 +1326,21 @@ async def _fallback_route(
     distance_km: float,
     issues: List[Dict],
     traffic: List[Dict],
-    noise: List[Dict]
+    noise: List[Dict],
+    context_summary: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """Fallback to hardcoded routing if ML fails. Still avoids issues."""
     # Filter issues to avoid based on route type (same logic as ML path)
-    issues_to_avoid = []
-    for issue in issues:
-        if 'lat' not in issue or 'lng' not in issue:
-            continue
-        severity = issue.get('severity', 0)
-        priority = issue.get('priority', '').lower()
-        issue_type = issue.get('issue_type', '').lower()
-        is_accident = 'accident' in issue_type or 'crash' in issue_type or priority == 'critical'
-
-        should_avoid = False
-        if is_accident:
-            should_avoid = True
-        elif route_type == 'drive':
-            should_avoid = severity > 0.6 or priority in ['high', 'critical']
-        elif route_type == 'eco':
-            should_avoid = severity > 0.7 or priority == 'critical'
-        elif route_type == 'quiet_walk':
-            should_avoid = severity > 0.5 or priority in ['high', 'critical']
-
-        if should_avoid:
-            issues_to_avoid.append(issue)
+    issues_to_avoid = _issues_to_avoid(_issues_to_soa(issues), route_type)
 
     # Use smart path generation that avoids issues
     path = _generate_smart_path(
         origin_lat, origin_lng, dest_lat, dest_lng,
         issues_to_avoid, route_type
     )
-    # Convert path from List[Dict] to List[Tuple[float, float]] for schema validation
-    path_tuples = [(point['lat'], point['lng']) for point in path]
-    metrics_result = _fallback_metrics(distance_km, route_type, issues, traffic, noise)
+    # Convert path to List[Tuple[float, float]] for schema validation
+    path_tuples = _path_tuples(path)
+    metrics_result = _fallback_metrics(distance_km, route_type, issues, traffic, noise, context_summary)
 
     return {
         "route_type": route_type,
@@ -693,19 +1355,26 @@ def _fallback_metrics(
     route_type: str,
     issues: List[Dict],
     traffic: List[Dict],
-    noise: List[Dict]
+    noise: List[Dict],
+    context_summary: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
-    """Fallback to hardcoded metric calculations."""
+    """
+    Fallback to hardcoded metric calculations.
+    context_summary is summarize_context(issues, traffic, noise), computed here if not given.
+    """
+    if context_summary is None:
+        context_summary = summarize_context(issues, traffic, noise)
+    # The summary substitutes a typical congestion for missing traffic data; the formulas assume none
+    avg_congestion = context_summary['avg_traffic'] if traffic else 0
+    
     if route_type == "drive":
         speed_kmh = settings.DEFAULT_DRIVE_SPEED_KMH
         eta_minutes = (distance_km / speed_kmh) * 60
         co2_kg = distance_km * 0.15
         
-        high_severity_nearby = sum(1 for i in issues if i.get('severity', 0) > 0.7)
+        high_severity_nearby = context_summary['high_severity_issues']
         eta_minutes += high_severity_nearby * 5
         
-        avg_congestion = sum(t.get('congestion', 0) for t in traffic) / len(traffic) if traffic else 0
-        
         return {
             "metrics": {
                 "distance_km": round(distance_km, 2),
@@ -720,7 +1389,6 @@ def _fallback_metrics(
         speed_kmh = settings.DEFAULT_DRIVE_SPEED_KMH * 0.9
         eta_minutes = (distance_km / speed_kmh) * 60
         
-        avg_congestion = sum(t.get('congestion', 0) for t in traffic) / len(traffic) if traffic else 0
         co2_kg = distance_km * 0.12 * (1 - avg_congestion * 0.2)
         
         return {
@@ -737,7 +1405,7 @@ def _fallback_metrics(
         speed_kmh = settings.DEFAULT_WALK_SPEED_KMH
         eta_minutes = (distance_km / speed_kmh) * 60
         
-        avg_noise = sum(n.get('noise_db', 50) for n in noise) / len(noise) if noise else 50
+        avg_noise = context_summary['avg_noise']
         
         return {
             "metrics": {
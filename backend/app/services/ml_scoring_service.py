@@ -7,7 +7,7 @@ from app.core.config import get_settings
 import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
-import json
+import orjson
 import re
 
 logger = logging.getLogger(__name__)
@@ -22,6 +22,9 @@ except Exception as e:
     logger.error(f"Failed to initialize Gemini for ML scoring: {e}")
     model = None
 
+# First JSON object in a response, allowing one level of nesting
+_JSON_OBJECT_RE = re.compile(r'\{(?:[^{}]|(?:\{[^{}]*\}))*\}', re.DOTALL)
+
 
 def _extract_json_from_text(text: str) -> Optional[Dict[str, Any]]:
     """
@@ -36,13 +39,12 @@ def _extract_json_from_text(text: str) -> Optional[Dict[str, Any]]:
     """
     try:
         # Try to find JSON object using improved regex that handles nesting
-        # Use DOTALL flag to match across newlines
-        json_match = re.search(r'\{(?:[^{}]|(?:\{[^{}]*\}))*\}', text, re.DOTALL)
+        json_match = _JSON_OBJECT_RE.search(text)
         if json_match:
             json_str = json_match.group()
-            return json.loads(json_str)
+            return orjson.loads(json_str)
         return None
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         logger.warning(f"Failed to parse JSON from AI response: {e}")
         return None
     except Exception as e:
@@ -96,7 +98,7 @@ Consider:
 Respond with ONLY a JSON object in this format:
 {{"severity": 0.75, "reasoning": "Brief explanation"}}"""
 
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         text = response.text.strip()
 
         # Extract JSON from response
@@ -173,7 +175,7 @@ Consider:
 Respond with ONLY a JSON object:
 {{"urgency": 0.85, "reasoning": "Brief explanation"}}"""
 
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         text = response.text.strip()
 
         result = _extract_json_from_text(text)
@@ -240,7 +242,7 @@ Consider:
 Respond with ONLY a JSON object:
 {{"priority": "high", "reasoning": "Brief explanation"}}"""
 
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         text = response.text.strip()
 
         result = _extract_json_from_text(text)
@@ -313,7 +315,7 @@ Consider:
 Respond with ONLY a JSON object:
 {{"action_type": "emergency", "reasoning": "Brief explanation"}}"""
 
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         text = response.text.strip()
 
         result = _extract_json_from_text(text)
@@ -1,10 +1,15 @@
 """Supabase service for database operations."""
 from supabase import Client
 from typing import List, Dict, Any, Optional
+from app.utils.cache import USER_COUNT_CACHE
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Rows per INSERT request for bulk writes
+BULK_INSERT_CHUNK_SIZE = 1000
+
 
 class SupabaseService:
     """Service class for Supabase database operations."""
@@ -335,18 +340,21 @@ class SupabaseService:
     # =====================================================
 
     async def create_user(self, user_data: dict):
-        """Create a new user."""
+        """Create a new user (returned with its rank, read back through users_with_rank)."""
         try:
             response = self.client.table("users").insert(user_data).execute()
-            return response.data[0] if response.data else None
+            if not response.data:
+                return None
+            return await self.get_user_by_id(response.data[0]["id"])
         except Exception as e:
             logger.error(f"Error creating user: {e}")
             raise
 
     async def get_user_by_id(self, user_id: str):
-        """Get user by ID."""
+        """Get user by ID (request runs in a worker thread so it can overlap other calls)."""
         try:
-            response = self.client.table("users").select("*").eq("id", user_id).execute()
+            query = self.client.table("users_with_rank").select("*").eq("id", user_id)
+            response = await asyncio.to_thread(query.execute)
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error fetching user: {e}")
@@ -355,7 +363,7 @@ class SupabaseService:
     async def get_user_by_username(self, username: str):
         """Get user by username."""
         try:
-            response = self.client.table("users").select("*").eq("username", username).execute()
+            response = self.client.table("users_with_rank").select("*").eq("username", username).execute()
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error fetching user by username: {e}")
@@ -364,17 +372,19 @@ class SupabaseService:
     async def get_user_by_email(self, email: str):
         """Get user by email."""
         try:
-            response = self.client.table("users").select("*").eq("email", email).execute()
+            response = self.client.table("users_with_rank").select("*").eq("email", email).execute()
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error fetching user by email: {e}")
             raise
 
     async def update_user(self, user_id: str, update_data: dict):
-        """Update user data."""
+        """Update user data (returned with its rank, read back through users_with_rank)."""
         try:
             response = self.client.table("users").update(update_data).eq("id", user_id).execute()
-            return response.data[0] if response.data else None
+            if not response.data:
+                return None
+            return await self.get_user_by_id(user_id)
         except Exception as e:
             logger.error(f"Error updating user: {e}")
             raise
@@ -383,7 +393,7 @@ class SupabaseService:
         """Get leaderboard with pagination."""
         try:
             response = (
-                self.client.table("users")
+                self.client.table("users_with_rank")
                 .select("id, username, full_name, avatar_url, total_points, rank, issues_reported, issues_verified, created_at")
                 .order("total_points", desc=True)
                 .order("created_at")
@@ -396,38 +406,83 @@ class SupabaseService:
             raise
 
     async def get_total_user_count(self):
-        """Get total number of users."""
-        try:
-            response = self.client.table("users").select("id", count="exact").execute()
-            return response.count if hasattr(response, 'count') else 0
+        """
+        Get total number of users.
+        Uses PostgREST's estimated count (exact for small tables, planner
+        estimate for large ones) and memoizes it briefly.
+        """
+        if "total" in USER_COUNT_CACHE:
+            return USER_COUNT_CACHE["total"]
+        try:
+            response = self.client.table("users").select("id", count="estimated").limit(1).execute()
+            total = response.count if hasattr(response, 'count') and response.count is not None else 0
+            USER_COUNT_CACHE["total"] = total
+            return total
         except Exception as e:
             logger.error(f"Error counting users: {e}")
             raise
 
-    async def get_all_users_for_ranking(self):
-        """Get all users sorted for ranking calculation."""
+    async def increment_user_counters(self, user_id: str, points: int, reported_delta: int = 0, verified_delta: int = 0):
+        """Atomically add points and issue counts to a user (runs in a worker thread)."""
         try:
-            response = (
-                self.client.table("users")
-                .select("id, total_points, created_at")
-                .order("total_points", desc=True)
-                .order("created_at")
-                .execute()
-            )
-            return response.data if response.data else []
+            params = {
+                "p_user_id": user_id,
+                "p_points": points,
+                "p_reported_delta": reported_delta,
+                "p_verified_delta": verified_delta
+            }
+            query = self.client.rpc("increment_user_counters", params)
+            response = await asyncio.to_thread(query.execute)
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Error incrementing user counters: {e}")
+            raise
+
+    async def refresh_user_rankings(self):
+        """Rebuild user_rank_rankings from current points (refresh_user_rankings RPC)."""
+        try:
+            query = self.client.rpc("refresh_user_rankings", {})
+            response = await asyncio.to_thread(query.execute)
+            return response.data or 0
         except Exception as e:
-            logger.error(f"Error fetching users for ranking: {e}")
+            logger.error(f"Error refreshing user rankings: {e}")
+            raise
+
+    async def update_user_rank_incremental(self, user_id: str, old_points: int, new_points: int):
+        """Shift only the ranks crossed by one user's point change (update_user_rank_incremental RPC)."""
+        try:
+            params = {"p_user_id": user_id, "p_old_points": old_points, "p_new_points": new_points}
+            query = self.client.rpc("update_user_rank_incremental", params)
+            response = await asyncio.to_thread(query.execute)
+            return response.data
+        except Exception as e:
+            logger.error(f"Error updating user rank incrementally: {e}")
             raise
 
     async def create_points_history(self, history_data: dict):
-        """Create a points history record."""
+        """Create a points history record (request runs in a worker thread so it can overlap other calls)."""
         try:
-            response = self.client.table("user_points_history").insert(history_data).execute()
+            query = self.client.table("user_points_history").insert(history_data)
+            response = await asyncio.to_thread(query.execute)
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error creating points history: {e}")
             raise
 
+    async def create_points_history_bulk(self, records: List[dict]) -> int:
+        """Insert many points history records, one request per chunk of BULK_INSERT_CHUNK_SIZE rows."""
+        try:
+            inserted = 0
+            for start in range(0, len(records), BULK_INSERT_CHUNK_SIZE):
+                chunk = records[start:start + BULK_INSERT_CHUNK_SIZE]
+                query = self.client.table("user_points_history").insert(chunk, returning="minimal")
+                await asyncio.to_thread(query.execute)
+                inserted += len(chunk)
+            return inserted
+        except Exception as e:
+            logger.error(f"Error bulk creating points history: {e}")
+            raise
+
     async def get_user_points_history(self, user_id: str, limit: int = 50):
         """Get user's points history."""
         try:
@@ -515,35 +570,6 @@ class SupabaseService:
             logger.error(f"Error fetching accident hotspots: {e}")
             raise
 
-    async def get_accident_stats(self, start_date=None, end_date=None):
-        """Get accident statistics."""
-        try:
-            query = self.client.table("issues").select("severity, urgency, priority, status").eq("issue_type", "accident")
-
-            if start_date:
-                query = query.gte("created_at", start_date.isoformat())
-            if end_date:
-                query = query.lte("created_at", end_date.isoformat())
-
-            response = query.execute()
-            accidents = response.data if response.data else []
-
-            severities = [a.get("severity", 0) for a in accidents if a.get("severity") is not None]
-            urgencies = [a.get("urgency", 0) for a in accidents if a.get("urgency") is not None]
-
-            return {
-                "total": len(accidents),
-                "avg_severity": sum(severities) / len(severities) if severities else 0.0,
-                "avg_urgency": sum(urgencies) / len(urgencies) if urgencies else 0.0,
-                "critical_count": sum(1 for a in accidents if a.get("priority") == "critical"),
-                "high_count": sum(1 for a in accidents if a.get("priority") == "high"),
-                "resolved_count": sum(1 for a in accidents if a.get("status") == "resolved"),
-                "open_count": sum(1 for a in accidents if a.get("status") == "open")
-            }
-        except Exception as e:
-            logger.error(f"Error getting accident stats: {e}")
-            raise
-
     async def get_accidents_by_hour(self):
         """Get accidents grouped by hour of day."""
         try:
@@ -562,34 +588,20 @@ class SupabaseService:
             logger.error(f"Error getting accidents by hour: {e}")
             raise
 
-    async def get_accident_trends(self, days: int = 30):
-        """Get accident trends over time."""
+    async def get_accident_dashboard(self, start_date=None, end_date=None, days: int = 30,
+                                     sections=("stats", "trends")):
+        """Get accident statistics and/or trends in one round-trip (accidents_dashboard RPC)."""
         try:
-            from datetime import datetime, timedelta
-
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=days)
-
-            response = (
-                self.client.table("issues")
-                .select("created_at")
-                .eq("issue_type", "accident")
-                .gte("created_at", start_date.isoformat())
-                .execute()
-            )
-            accidents = response.data if response.data else []
-
-            total = len(accidents)
-            avg_per_day = total / days if days > 0 else 0
-
-            return {
-                "total": total,
-                "avg_per_day": round(avg_per_day, 2),
-                "daily_counts": [],
-                "trend_direction": "stable"
+            params = {
+                "p_start": start_date.isoformat() if start_date else None,
+                "p_end": end_date.isoformat() if end_date else None,
+                "p_days": days,
+                "p_sections": list(sections)
             }
+            response = self.client.rpc("accidents_dashboard", params).execute()
+            return response.data if response.data else {}
         except Exception as e:
-            logger.error(f"Error getting accident trends: {e}")
+            logger.error(f"Error getting accident dashboard: {e}")
             raise
 
     async def get_issues_in_bounds(self, min_lat: float, max_lat: float, min_lng: float, max_lng: float):
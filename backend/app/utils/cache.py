@@ -2,7 +2,7 @@
 Response Caching Utility
 Provides TTL-based caching for API responses to improve performance.
 """
-from cachetools import TTLCache
+from cachetools import LRUCache, TTLCache
 from functools import wraps
 import hashlib
 import json
@@ -11,11 +11,29 @@ from typing import Any, Callable
 
 logger = logging.getLogger(__name__)
 
+
+class CountingTTLCache(TTLCache):
+    """TTLCache that counts entries evicted to make room (expired entries are not counted)."""
+
+    def __init__(self, maxsize, ttl, **kwargs):
+        super().__init__(maxsize, ttl, **kwargs)
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
 # Configure caches with different TTLs for different data types
 LEADERBOARD_CACHE = TTLCache(maxsize=100, ttl=60)  # 1 minute
 ACCIDENT_HISTORY_CACHE = TTLCache(maxsize=500, ttl=300)  # 5 minutes
 RISK_INDEX_CACHE = TTLCache(maxsize=1000, ttl=600)  # 10 minutes
 GENERAL_CACHE = TTLCache(maxsize=200, ttl=120)  # 2 minutes
+USER_COUNT_CACHE = TTLCache(maxsize=1, ttl=60)  # 1 minute
+WORK_ORDER_SUGGESTION_CACHE = TTLCache(maxsize=1024, ttl=86400)  # 24 hours
+ISSUE_IMAGE_CACHE = LRUCache(maxsize=128)  # Downscaled JPEG bytes keyed by (path, mtime)
+ROUTE_PLAN_CACHE = CountingTTLCache(maxsize=1024, ttl=300)  # 5 minutes, keyed by quantized route inputs
+STREET_ROUTE_CACHE = TTLCache(maxsize=2048, ttl=3600)  # 1 hour, ORS/OSRM geometry by rounded endpoints
 
 
 def generate_cache_key(prefix: str, *args, **kwargs) -> str:
@@ -0,0 +1,34 @@
+"""Tests for gamification point calculation."""
+import numpy as np
+import pytest
+
+from app.services.gamification_service import GamificationService
+
+
+@pytest.fixture
+def service():
+    return GamificationService(db_service=None)
+
+
+def test_points_batch_matches_scalar(service):
+    """calculate_points_batch gives the same points as calculate_points_for_issue."""
+    rng = np.random.default_rng(0)
+    issue_types = rng.choice(["pothole", "accident", "streetlight", "flooding"], size=1000)
+    severity = rng.random(1000)
+    urgency = rng.random(1000)
+    # Include the boundaries, where truncation toward zero matters
+    severity[:4] = [0.0, 1.0, 0.0, 1.0]
+    urgency[:4] = [0.0, 1.0, 1.0, 0.0]
+
+    batch = service.calculate_points_batch(issue_types, severity, urgency)
+    expected = [
+        service.calculate_points_for_issue(str(t), float(s), float(u))
+        for t, s, u in zip(issue_types, severity, urgency)
+    ]
+
+    assert batch.tolist() == expected
+
+
+def test_points_batch_accepts_lists(service):
+    """Plain Python sequences work as well as arrays."""
+    assert service.calculate_points_batch(["accident", "pothole"], [1.0, 0.0], [1.0, 0.0]).tolist() == [85, 50]
@@ -0,0 +1,73 @@
+"""Tests for Gemini text prompt micro-batching."""
+import asyncio
+import threading
+
+import pytest
+
+from app.services import gemini_service
+from app.services.gemini_service import _PromptBatcher
+
+
+class FakeModel:
+    """Records generate_content calls; prompts starting with "fail" raise."""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.calls.append(prompt)
+        if prompt.startswith("fail"):
+            raise RuntimeError(prompt)
+        return f"response to {prompt}"
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(gemini_service, "model", model)
+    return model
+
+
+@pytest.mark.asyncio
+async def test_identical_prompts_share_one_call(fake_model):
+    """Duplicate prompts in one window are sent once and every caller gets the result."""
+    batcher = _PromptBatcher(window=0.05)
+    prompts = ["a", "b", "a", "c", "a", "b"]
+    try:
+        results = await asyncio.gather(*(batcher.submit(prompt) for prompt in prompts))
+    finally:
+        batcher._worker.cancel()
+
+    assert sorted(fake_model.calls) == ["a", "b", "c"]
+    assert results == [f"response to {prompt}" for prompt in prompts]
+
+
+@pytest.mark.asyncio
+async def test_errors_fan_out_only_to_matching_callers(fake_model):
+    """A failing prompt raises for each of its callers without affecting the rest of the batch."""
+    batcher = _PromptBatcher(window=0.05)
+    prompts = ["fail-1", "ok", "fail-1"]
+    try:
+        results = await asyncio.gather(*(batcher.submit(prompt) for prompt in prompts), return_exceptions=True)
+    finally:
+        batcher._worker.cancel()
+
+    assert sorted(fake_model.calls) == ["fail-1", "ok"]
+    assert isinstance(results[0], RuntimeError) and isinstance(results[2], RuntimeError)
+    assert results[1] == "response to ok"
+
+
+@pytest.mark.asyncio
+async def test_batches_are_capped_at_max_batch(fake_model):
+    """More distinct prompts than max_batch are split across batches but all answered."""
+    batcher = _PromptBatcher(window=0.05, max_batch=2)
+    prompts = [f"p{i}" for i in range(5)]
+    try:
+        results = await asyncio.gather(*(batcher.submit(prompt) for prompt in prompts))
+    finally:
+        batcher._worker.cancel()
+
+    assert sorted(fake_model.calls) == sorted(prompts)
+    assert results == [f"response to {prompt}" for prompt in prompts]
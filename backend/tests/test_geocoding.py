@@ -0,0 +1,170 @@
+"""Tests for the geocoding service's rate limiter, request coalescing, failure cache and legacy import."""
+import asyncio
+
+import pytest
+from cachetools import TTLCache
+
+from app.services import geocoding_service
+from app.services.geocoding_service import AsyncTokenBucket
+
+
+class FakeResponse:
+    """Minimal httpx response for a successful Nominatim lookup."""
+
+    status_code = 200
+    content = b'{"display_name": "Main St", "address": {"road": "Main St", "city": "Springfield"}}'
+
+
+class FakeClient:
+    """Counts /reverse calls; each call waits on `release` so callers can pile up."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def get(self, path, params=None):
+        self.calls += 1
+        await self.release.wait()
+        return FakeResponse()
+
+
+@pytest.fixture
+def geocoder(monkeypatch):
+    """Geocoding module with an empty in-memory cache and no database or rate limiting."""
+    monkeypatch.setattr(geocoding_service, "_cache_opened", True)
+    monkeypatch.setattr(geocoding_service, "_cache_db", None)
+    monkeypatch.setattr(geocoding_service, "_geocode_cache", {})
+    monkeypatch.setattr(geocoding_service, "_inflight", {})
+    monkeypatch.setattr(geocoding_service, "_failed_lookups", TTLCache(maxsize=100, ttl=60))
+    monkeypatch.setattr(geocoding_service, "_bucket", AsyncTokenBucket(rate=1000, burst=1000))
+    return geocoding_service
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst_then_waits():
+    """The first `burst` acquires are immediate; the next waits one refill interval."""
+    bucket = AsyncTokenBucket(rate=10, burst=3)
+    loop = asyncio.get_running_loop()
+
+    start = loop.time()
+    for _ in range(3):
+        await bucket.acquire()
+    assert loop.time() - start < 0.05
+
+    await bucket.acquire()
+    assert loop.time() - start == pytest.approx(0.1, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_refills_over_time():
+    """Idle time refills tokens at `rate`, capped at `burst`."""
+    bucket = AsyncTokenBucket(rate=10, burst=2)
+    loop = asyncio.get_running_loop()
+    await bucket.acquire()
+    await bucket.acquire()
+
+    await asyncio.sleep(0.5)  # Enough for 5 tokens, but only 2 fit
+
+    start = loop.time()
+    await bucket.acquire()
+    await bucket.acquire()
+    assert loop.time() - start < 0.05
+
+    await bucket.acquire()
+    assert loop.time() - start == pytest.approx(0.1, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_request(geocoder, monkeypatch):
+    """N concurrent misses for the same point make a single HTTP call."""
+    client = FakeClient()
+    monkeypatch.setattr(geocoder, "_get_client", lambda: client)
+
+    lookups = [asyncio.ensure_future(geocoder.reverse_geocode(40.7128, -74.0060)) for _ in range(10)]
+    await asyncio.sleep(0)
+    client.release.set()
+    results = await asyncio.gather(*lookups)
+
+    assert client.calls == 1
+    assert len(set(results)) == 1 and results[0]
+    assert geocoder._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_request_exception_reaches_every_waiter(geocoder, monkeypatch):
+    """If the shared request raises, every coalesced caller sees the exception."""
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def failing_request(lat, lng, cache_key, retries):
+        started.set()
+        await release.wait()
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(geocoder, "_request_location", failing_request)
+
+    lookups = [asyncio.ensure_future(geocoder.reverse_geocode(40.7128, -74.0060)) for _ in range(5)]
+    await started.wait()
+    release.set()
+    results = await asyncio.gather(*lookups, return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert geocoder._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_lookups_expire(geocoder, monkeypatch):
+    """A failed lookup is skipped while remembered, and retried once its TTL passes."""
+    now = [0.0]
+    monkeypatch.setattr(geocoder, "_failed_lookups", TTLCache(maxsize=100, ttl=10, timer=lambda: now[0]))
+    calls = []
+
+    async def empty_request(lat, lng, cache_key, retries):
+        calls.append((lat, lng))
+        return None
+
+    monkeypatch.setattr(geocoder, "_request_location", empty_request)
+
+    assert await geocoder.reverse_geocode(40.7128, -74.0060) is None
+    assert await geocoder.reverse_geocode(40.7128, -74.0060) is None
+    assert len(calls) == 1
+
+    now[0] = 11.0
+    assert await geocoder.reverse_geocode(40.7128, -74.0060) is None
+    assert len(calls) == 2
+
+
+def test_legacy_cache_file_found_at_historical_location(monkeypatch, tmp_path):
+    """The JSON cache the app wrote from backend/ (backend/backend/data) is found from any cwd."""
+    monkeypatch.chdir(tmp_path)
+    expected = geocoding_service.CACHE_DIR.parent / "backend" / "data" / geocoding_service.LEGACY_CACHE_NAME
+    assert expected.exists()
+    assert geocoding_service._find_legacy_cache_file() == expected
+
+
+def test_open_cache_imports_legacy_json(monkeypatch, tmp_path):
+    """With an empty database, open_cache imports the legacy JSON file and persists it."""
+    legacy_dir = tmp_path / "backend" / "data"
+    legacy_dir.mkdir(parents=True)
+    (legacy_dir / geocoding_service.LEGACY_CACHE_NAME).write_text(
+        '{"33.7743_-84.3959": "704 Cherry Street Northwest, Atlanta, Georgia"}'
+    )
+    cache_dir = tmp_path / "data"
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(geocoding_service, "CACHE_DIR", cache_dir)
+    monkeypatch.setattr(geocoding_service, "CACHE_DB", cache_dir / "geocode_cache.sqlite")
+    monkeypatch.setattr(geocoding_service, "LEGACY_CACHE_DIRS", (cache_dir, tmp_path / "backend" / "data"))
+    monkeypatch.setattr(geocoding_service, "_cache_opened", False)
+    monkeypatch.setattr(geocoding_service, "_cache_db", None)
+    monkeypatch.setattr(geocoding_service, "_geocode_cache", {})
+
+    geocoding_service.open_cache()
+    try:
+        expected = "704 Cherry Street Northwest, Atlanta, Georgia"
+        assert geocoding_service.reverse_geocode_cached(33.7743, -84.3959) == expected
+        stored = geocoding_service._cache_db.execute(
+            f"SELECT COUNT(*) FROM {geocoding_service.CACHE_TABLE}"
+        ).fetchone()[0]
+        assert stored == 1
+    finally:
+        geocoding_service.close_cache()
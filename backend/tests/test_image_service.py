@@ -0,0 +1,77 @@
+"""Tests for image upload validation and streaming saves."""
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from app.services import image_service
+
+
+def _upload(filename, data=b"img", content_type="image/png", size=None):
+    return UploadFile(
+        file=io.BytesIO(data),
+        filename=filename,
+        size=size,
+        headers=Headers({"content-type": content_type}),
+    )
+
+
+@pytest.fixture
+def upload_settings(monkeypatch, tmp_path):
+    """Small size limit and a temporary upload directory."""
+    monkeypatch.setattr(image_service.settings, "MAX_UPLOAD_SIZE", 1024)
+    monkeypatch.setattr(image_service.settings, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("filename", ["photo.jpg", "photo.JPEG", "scan.png", "shot.webp", "no_extension"])
+async def test_validate_accepts_whitelisted_extensions(filename):
+    assert await image_service.validate_image(_upload(filename)) is True
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("filename", ["payload.php", "image.png.exe", "vector.svg", "archive.tar.gz"])
+async def test_validate_rejects_other_extensions(filename):
+    with pytest.raises(HTTPException) as exc_info:
+        await image_service.validate_image(_upload(filename))
+    assert exc_info.value.status_code == 400
+    assert "extension" in exc_info.value.detail
+
+
+@pytest.mark.asyncio
+async def test_validate_rejects_disallowed_content_type():
+    with pytest.raises(HTTPException) as exc_info:
+        await image_service.validate_image(_upload("photo.png", content_type="text/html"))
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_validate_rejects_reported_oversize(upload_settings):
+    with pytest.raises(HTTPException) as exc_info:
+        await image_service.validate_image(_upload("photo.png", size=2048))
+    assert exc_info.value.status_code == 400
+    assert "too large" in exc_info.value.detail
+
+
+@pytest.mark.asyncio
+async def test_save_streams_file_within_limit(upload_settings):
+    data = os.urandom(1024)
+    filename = await image_service.save_image(_upload("photo.PNG", data))
+
+    assert filename.endswith(".png")
+    assert (upload_settings / filename).read_bytes() == data
+
+
+@pytest.mark.asyncio
+async def test_save_rejects_oversize_and_removes_partial_file(upload_settings, monkeypatch):
+    """Uploads without a reported size are cut off while streaming."""
+    monkeypatch.setattr(image_service, "UPLOAD_CHUNK_SIZE", 256)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await image_service.save_image(_upload("photo.png", os.urandom(1025)))
+
+    assert exc_info.value.status_code == 400
+    assert list(upload_settings.iterdir()) == []
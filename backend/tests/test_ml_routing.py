@@ -0,0 +1,167 @@
+"""Tests for ML routing response parsing, streaming, route caching and issue filtering."""
+import json
+import random
+
+import numpy as np
+import pytest
+
+from app.services import ml_routing_service
+from app.services.ml_routing_service import (
+    _extract_json_object,
+    _issues_to_avoid,
+    _issues_to_soa,
+    _partial_reasoning,
+    _REASONING_START_RE,
+)
+from app.utils.cache import CountingTTLCache
+
+
+def test_extract_json_object_from_fenced_response():
+    """A single object wrapped in a code fence and prose is found."""
+    text = 'Here you go:\n```json\n{"eta_minutes": 25, "reasoning": "Rush hour"}\n```'
+    assert _extract_json_object(text, "eta_minutes") == {"eta_minutes": 25, "reasoning": "Rush hour"}
+
+
+def test_extract_json_object_skips_objects_without_key():
+    """Objects lacking the required key are skipped in favour of a later one."""
+    text = 'Example: {"note": "ignore me"} Answer: {"waypoints": [{"lat": 1.0, "lng": 2.0}]}'
+    assert _extract_json_object(text, "waypoints") == {"waypoints": [{"lat": 1.0, "lng": 2.0}]}
+
+
+def test_extract_json_object_handles_braces_and_quotes_in_strings():
+    """Braces and escaped quotes inside strings don't end the object early."""
+    payload = {"eta_minutes": 12, "reasoning": 'Avoids the "Main St {closed}" segment'}
+    text = "Result: " + json.dumps(payload) + " trailing }"
+    assert _extract_json_object(text, "eta_minutes") == payload
+
+
+def test_extract_json_object_returns_none_for_malformed_text():
+    """Malformed or missing JSON yields None instead of raising."""
+    assert _extract_json_object("no json here", "eta_minutes") is None
+    assert _extract_json_object('{"eta_minutes": 25, "reasoning": "unterminated', "eta_minutes") is None
+
+
+def test_partial_reasoning_decodes_escaped_quotes():
+    """A complete reasoning string is decoded, including escaped quotes."""
+    text = '{"eta_minutes": 20, "reasoning": "Avoids \\"Main St\\" closures"}'
+    start = _REASONING_START_RE.search(text).end()
+    assert _partial_reasoning(text, start) == 'Avoids "Main St" closures'
+
+
+def test_partial_reasoning_holds_back_incomplete_escape():
+    """Text cut mid-escape returns only the complete prefix, and grows monotonically."""
+    full = '{"eta_minutes": 20, "reasoning": "Say \\"hi\\" \\u00e9t\\u00e9 done"}'
+    start = _REASONING_START_RE.search(full).end()
+
+    previous = ""
+    for end in range(start, len(full) + 1):
+        partial = _partial_reasoning(full[:end], start)
+        assert partial.startswith(previous)
+        previous = partial
+    assert previous == 'Say "hi" été done'
+
+
+@pytest.mark.asyncio
+async def test_stream_emits_metrics_then_explanation_deltas(monkeypatch):
+    """Streamed chunks split inside escapes still reassemble into the full explanation."""
+    response = '{"eta_minutes": 18, "co2_kg": 1.2, "congestion_score": 0.4, "reasoning": "Skips \\"5th Ave\\" jam"}'
+    chunks = [response[i:i + 7] for i in range(0, len(response), 7)]
+
+    class FakeModel:
+        async def generate_content_async(self, prompt, generation_config=None, stream=False):
+            async def stream():
+                for text in chunks:
+                    yield type("Chunk", (), {"text": text})()
+            return stream()
+
+    async def street_route(*args):
+        return np.array([[40.0, -74.0], [40.1, -74.1]])
+
+    monkeypatch.setattr(ml_routing_service, "model", FakeModel())
+    monkeypatch.setattr(ml_routing_service, "_get_street_route_ors", street_route)
+
+    events = [
+        event async for event in ml_routing_service.plan_route_ml_stream(
+            40.0, -74.0, 40.1, -74.1, "drive", llm_policy="always"
+        )
+    ]
+
+    assert events[0]["metrics"]["eta_minutes"] == 18
+    deltas = "".join(event["explanation_delta"] for event in events if "explanation_delta" in event)
+    assert deltas == 'Skips "5th Ave" jam'
+    assert events[-1]["explanation"] == deltas
+    assert events[-1]["path"] == [(40.0, -74.0), (40.1, -74.1)]
+
+
+@pytest.mark.asyncio
+async def test_route_cache_hit_is_a_copy_with_requested_endpoints(monkeypatch):
+    """A cache hit doesn't expose the cached dict and starts/ends at the caller's own points."""
+    calls = []
+
+    async def generate_path(olat, olng, dlat, dlng, route_type, issues):
+        calls.append((olat, olng, dlat, dlng))
+        return np.array([[olat, olng], [40.05, -74.05], [dlat, dlng]])
+
+    async def predict_metrics(*args):
+        return {"metrics": {"eta_minutes": 12}, "explanation": "Clear roads"}
+
+    monkeypatch.setattr(ml_routing_service, "model", object())
+    monkeypatch.setattr(ml_routing_service, "_generate_path", generate_path)
+    monkeypatch.setattr(ml_routing_service, "predict_route_metrics_ml", predict_metrics)
+    monkeypatch.setattr(ml_routing_service, "ROUTE_PLAN_CACHE", CountingTTLCache(maxsize=1, ttl=60))
+
+    first = await ml_routing_service.plan_route_ml(40.0001, -74.0001, 40.1001, -74.1001, "drive", llm_policy="always")
+    first["metrics"]["eta_minutes"] = 99
+    first["path"].append((0.0, 0.0))
+
+    second = await ml_routing_service.plan_route_ml(40.0004, -74.0004, 40.1004, -74.1004, "drive", llm_policy="always")
+
+    assert len(calls) == 1
+    assert second["metrics"] == {"eta_minutes": 12}
+    assert second["path"] == [(40.0004, -74.0004), (40.05, -74.05), (40.1004, -74.1004)]
+
+    await ml_routing_service.plan_route_ml(41.0, -75.0, 41.1, -75.1, "drive", llm_policy="always")
+    assert ml_routing_service.cache_stats()["evictions"] == 1
+
+
+def _should_avoid(issue, route_type):
+    """Per-issue filter the IssueArrays masks replaced."""
+    severity = issue.get('severity', 0)
+    priority = issue.get('priority', '').lower()
+    issue_type = issue.get('issue_type', '').lower()
+    if 'accident' in issue_type or 'crash' in issue_type or priority == 'critical':
+        return True
+    if route_type == 'drive':
+        return severity > 0.6 or priority in ['high', 'critical']
+    if route_type == 'eco':
+        return severity > 0.7 or priority == 'critical'
+    if route_type == 'quiet_walk':
+        return severity > 0.5 or priority in ['high', 'critical']
+    return False
+
+
+@pytest.mark.parametrize("route_type", ["drive", "eco", "quiet_walk", "other"])
+def test_issue_mask_matches_per_issue_filter(route_type):
+    """_issues_to_avoid selects exactly the issues the per-issue filter did, in order."""
+    rng = random.Random(route_type)
+    issues = []
+    for _ in range(500):
+        issue = {
+            "lat": rng.uniform(40.6, 40.8),
+            "lng": rng.uniform(-74.1, -73.9),
+            "issue_type": rng.choice(["pothole", "Accident", "car crash", "noise", ""]),
+            "priority": rng.choice(["low", "medium", "High", "critical", ""]),
+        }
+        if rng.random() < 0.8:
+            issue["severity"] = rng.choice([0.5, 0.6, 0.7, rng.random()])
+        if rng.random() < 0.05:
+            del issue["lng"]
+        issues.append(issue)
+
+    expected = [
+        (issue["lat"], issue["lng"]) for issue in issues
+        if "lat" in issue and "lng" in issue and _should_avoid(issue, route_type)
+    ]
+    avoided = _issues_to_avoid(_issues_to_soa(issues), route_type)
+
+    assert list(zip(avoided.lat.tolist(), avoided.lng.tolist())) == expected
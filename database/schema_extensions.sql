@@ -26,14 +26,16 @@ COMMENT ON COLUMN users.id IS 'Unique identifier for the user';
 COMMENT ON COLUMN users.username IS 'Unique username for the user';
 COMMENT ON COLUMN users.email IS 'User email address';
 COMMENT ON COLUMN users.total_points IS 'Total gamification points earned';
-COMMENT ON COLUMN users.rank IS 'Current rank position in leaderboard';
+COMMENT ON COLUMN users.rank IS 'Legacy rank column; current ranks live in user_rank_rankings';
 COMMENT ON COLUMN users.issues_reported IS 'Number of issues reported by user';
 COMMENT ON COLUMN users.issues_verified IS 'Number of issues verified by user';
 
 -- Indexes for users
 CREATE INDEX IF NOT EXISTS idx_users_username ON users (username);
 CREATE INDEX IF NOT EXISTS idx_users_email ON users (email);
-CREATE INDEX IF NOT EXISTS idx_users_total_points ON users (total_points DESC);
+-- Matches the leaderboard/ranking order so it is read straight off the index
+CREATE INDEX IF NOT EXISTS idx_users_points_ranking ON users (total_points DESC, created_at ASC) INCLUDE (id);
+DROP INDEX IF EXISTS idx_users_total_points;  -- superseded by idx_users_points_ranking
 CREATE INDEX IF NOT EXISTS idx_users_rank ON users (rank);
 CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at DESC);
 
@@ -58,10 +60,28 @@ COMMENT ON COLUMN user_points_history.action_type IS 'Type of action that earned
 COMMENT ON COLUMN user_points_history.issue_id IS 'Related issue if applicable';
 
 -- Indexes for user_points_history
-CREATE INDEX IF NOT EXISTS idx_user_points_history_user_id ON user_points_history (user_id);
+-- (user_id, created_at DESC) serves per-user history pages in order, without a sort step
+CREATE INDEX IF NOT EXISTS idx_user_points_history_user_created ON user_points_history (user_id, created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_user_points_history_issue_id ON user_points_history (issue_id);
 CREATE INDEX IF NOT EXISTS idx_user_points_history_created_at ON user_points_history (created_at DESC);
 
+-- =====================================================
+-- TABLE: user_rank_rankings
+-- Leaderboard positions, rebuilt periodically apart from users
+-- =====================================================
+CREATE TABLE IF NOT EXISTS user_rank_rankings (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    rank INTEGER NOT NULL,
+    computed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE user_rank_rankings IS 'Leaderboard rank per user, recomputed by a background job so ranking writes never lock users';
+COMMENT ON COLUMN user_rank_rankings.rank IS 'Rank position in leaderboard (1 = most points)';
+COMMENT ON COLUMN user_rank_rankings.computed_at IS 'When this rank last changed (ranks are eventually consistent)';
+
+-- Indexes for user_rank_rankings
+CREATE INDEX IF NOT EXISTS idx_user_rank_rankings_rank ON user_rank_rankings (rank);
+
 -- =====================================================
 -- TABLE: risk_blocks
 -- Precomputed risk scores for geographic blocks
@@ -134,7 +154,27 @@ CREATE TRIGGER update_risk_blocks_updated_at
 -- VIEWS: Useful query shortcuts
 -- =====================================================
 
--- Leaderboard view
+-- Users with their current leaderboard rank
+CREATE OR REPLACE VIEW users_with_rank AS
+SELECT
+    u.id,
+    u.username,
+    u.email,
+    u.full_name,
+    u.avatar_url,
+    u.total_points,
+    COALESCE(r.rank, 0) AS rank,
+    r.computed_at AS rank_updated_at,
+    u.issues_reported,
+    u.issues_verified,
+    u.created_at,
+    u.updated_at
+FROM users u
+LEFT JOIN user_rank_rankings r ON r.user_id = u.id;
+
+COMMENT ON VIEW users_with_rank IS 'User profiles joined with their rank from user_rank_rankings';
+
+-- Leaderboard view (ranks from user_rank_rankings via users_with_rank)
 CREATE OR REPLACE VIEW leaderboard AS
 SELECT
     u.id,
@@ -146,8 +186,8 @@ SELECT
     u.issues_reported,
     u.issues_verified,
     u.created_at
-FROM users
-ORDER BY total_points DESC, created_at ASC;
+FROM users_with_rank u
+ORDER BY u.total_points DESC, u.created_at ASC;
 
 COMMENT ON VIEW leaderboard IS 'User leaderboard sorted by points';
 
@@ -188,6 +228,186 @@ ORDER BY overall_risk DESC;
 
 COMMENT ON VIEW high_risk_areas IS 'Blocks with high overall risk scores (>= 0.6)';
 
+-- =====================================================
+-- FUNCTIONS: Server-side aggregations (called via RPC)
+-- =====================================================
+
+-- Accident dashboard: statistics and/or daily trends from a single scan.
+-- p_sections picks which of 'stats' and 'trends' to compute; base only reads
+-- rows inside the union of the requested windows (an index range on created_at)
+-- Replaces the three-argument version, which would otherwise make named calls ambiguous
+DROP FUNCTION IF EXISTS accidents_dashboard(TIMESTAMPTZ, TIMESTAMPTZ, INTEGER);
+CREATE OR REPLACE FUNCTION accidents_dashboard(
+    p_start TIMESTAMPTZ DEFAULT NULL,
+    p_end TIMESTAMPTZ DEFAULT NULL,
+    p_days INTEGER DEFAULT 30,
+    p_sections TEXT[] DEFAULT ARRAY['stats', 'trends']
+)
+RETURNS JSONB AS $$
+    WITH base AS (
+        SELECT
+            severity,
+            urgency,
+            priority,
+            status,
+            created_at,
+            (p_start IS NULL OR created_at >= p_start)
+                AND (p_end IS NULL OR created_at <= p_end) AS in_stats,
+            created_at >= NOW() - make_interval(days => p_days) AS in_trends
+        FROM issues
+        WHERE issue_type = 'accident'
+          AND created_at >= LEAST(
+              CASE WHEN 'stats' = ANY(p_sections) THEN COALESCE(p_start, '-infinity') ELSE 'infinity' END,
+              CASE WHEN 'trends' = ANY(p_sections) THEN NOW() - make_interval(days => p_days) ELSE 'infinity' END
+          )
+          AND (p_end IS NULL OR 'trends' = ANY(p_sections) OR created_at <= p_end)
+    )
+    SELECT jsonb_build_object(
+        'stats', CASE WHEN 'stats' = ANY(p_sections) THEN (
+            SELECT jsonb_build_object(
+                'total', COUNT(*),
+                'avg_severity', COALESCE(AVG(severity), 0),
+                'avg_urgency', COALESCE(AVG(urgency), 0),
+                'critical_count', COUNT(*) FILTER (WHERE priority = 'critical'),
+                'high_count', COUNT(*) FILTER (WHERE priority = 'high'),
+                'resolved_count', COUNT(*) FILTER (WHERE status = 'resolved'),
+                'open_count', COUNT(*) FILTER (WHERE status = 'open')
+            )
+            FROM base
+            WHERE in_stats
+        ) END,
+        'trends', CASE WHEN 'trends' = ANY(p_sections) THEN (
+            SELECT jsonb_build_object(
+                'total', COALESCE(SUM(day_count), 0),
+                'daily_counts', COALESCE(
+                    jsonb_agg(jsonb_build_object('date', day, 'count', day_count) ORDER BY day),
+                    '[]'::jsonb
+                )
+            )
+            FROM (
+                SELECT date_trunc('day', created_at)::date AS day, COUNT(*) AS day_count
+                FROM base
+                WHERE in_trends
+                GROUP BY 1
+            ) daily
+        ) END
+    );
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION accidents_dashboard IS 'Accident statistics for [p_start, p_end] and/or daily counts for the last p_days (per p_sections), from one scan of issues';
+
+-- Rebuild leaderboard ranks in one statement
+CREATE OR REPLACE FUNCTION refresh_user_rankings()
+RETURNS INTEGER AS $$
+    WITH ranked AS (
+        INSERT INTO user_rank_rankings (user_id, rank, computed_at)
+        SELECT
+            id,
+            ROW_NUMBER() OVER (ORDER BY total_points DESC, created_at ASC),
+            NOW()
+        FROM users
+        ORDER BY id  -- write user_rank_rankings in primary-key order
+        ON CONFLICT (user_id) DO UPDATE
+        SET rank = EXCLUDED.rank,
+            computed_at = EXCLUDED.computed_at
+        -- Unchanged ranks are skipped, so a rebuild only writes rows that moved
+        WHERE user_rank_rankings.rank IS DISTINCT FROM EXCLUDED.rank
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM ranked;
+$$ LANGUAGE sql;
+
+COMMENT ON FUNCTION refresh_user_rankings IS 'Recompute user_rank_rankings from users.total_points; returns number of ranks written';
+
+-- Incremental rank maintenance after one user's points change.
+-- Only users the changed user passed (or who passed it) shift by one place;
+-- refresh_user_rankings remains the periodic full rebuild.
+CREATE OR REPLACE FUNCTION update_user_rank_incremental(
+    p_user_id UUID,
+    p_old_points INTEGER,
+    p_new_points INTEGER
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_created_at TIMESTAMPTZ;
+    v_old_rank INTEGER;
+    v_passed INTEGER := 0;
+    v_new_rank INTEGER;
+BEGIN
+    SELECT u.created_at, r.rank
+    INTO v_created_at, v_old_rank
+    FROM users u
+    JOIN user_rank_rankings r ON r.user_id = u.id
+    WHERE u.id = p_user_id;
+
+    -- Unranked users are picked up by the next full rebuild
+    IF v_old_rank IS NULL OR p_new_points = p_old_points THEN
+        RETURN v_old_rank;
+    END IF;
+
+    IF p_new_points > p_old_points THEN
+        -- Users ranked above at the old score and below at the new score move down
+        UPDATE user_rank_rankings r
+        SET rank = r.rank + 1,
+            computed_at = NOW()
+        FROM users u
+        WHERE r.user_id = u.id
+          AND u.id <> p_user_id
+          AND u.total_points BETWEEN p_old_points AND p_new_points
+          AND (u.total_points > p_old_points OR u.created_at < v_created_at)
+          AND (u.total_points < p_new_points OR u.created_at > v_created_at);
+        GET DIAGNOSTICS v_passed = ROW_COUNT;
+        v_new_rank := v_old_rank - v_passed;
+    ELSE
+        -- Users ranked below at the old score and above at the new score move up
+        UPDATE user_rank_rankings r
+        SET rank = r.rank - 1,
+            computed_at = NOW()
+        FROM users u
+        WHERE r.user_id = u.id
+          AND u.id <> p_user_id
+          AND u.total_points BETWEEN p_new_points AND p_old_points
+          AND (u.total_points < p_old_points OR u.created_at > v_created_at)
+          AND (u.total_points > p_new_points OR u.created_at < v_created_at);
+        GET DIAGNOSTICS v_passed = ROW_COUNT;
+        v_new_rank := v_old_rank + v_passed;
+    END IF;
+
+    -- No neighbor crossed: ordering is unchanged, nothing else to write
+    IF v_passed > 0 THEN
+        UPDATE user_rank_rankings
+        SET rank = v_new_rank,
+            computed_at = NOW()
+        WHERE user_id = p_user_id;
+    END IF;
+
+    RETURN v_new_rank;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION update_user_rank_incremental IS 'Shift only the ranks crossed by one user''s point change; returns the user''s new rank';
+
+-- Percentiles are computed in the API from the materialized rank and a cached user count
+DROP FUNCTION IF EXISTS get_user_rank_percentile(UUID);
+
+-- Atomically add points and action counts to a user
+CREATE OR REPLACE FUNCTION increment_user_counters(
+    p_user_id UUID,
+    p_points INTEGER,
+    p_reported_delta INTEGER DEFAULT 0,
+    p_verified_delta INTEGER DEFAULT 0
+)
+RETURNS SETOF users AS $$
+    UPDATE users
+    SET total_points = total_points + p_points,
+        issues_reported = issues_reported + p_reported_delta,
+        issues_verified = issues_verified + p_verified_delta
+    WHERE id = p_user_id
+    RETURNING *;
+$$ LANGUAGE sql;
+
+COMMENT ON FUNCTION increment_user_counters IS 'Increment total_points and issue counters in place; returns the updated user (empty if not found)';
+
 -- =====================================================
 -- COMPLETION MESSAGE
 -- =====================================================
@@ -197,16 +417,24 @@ BEGIN
     RAISE NOTICE '========================================';
     RAISE NOTICE 'NeuraCity Schema Extensions Created Successfully';
     RAISE NOTICE '========================================';
-    RAISE NOTICE 'New Tables created: 3';
+    RAISE NOTICE 'New Tables created: 4';
     RAISE NOTICE '  - users';
     RAISE NOTICE '  - user_points_history';
+    RAISE NOTICE '  - user_rank_rankings';
     RAISE NOTICE '  - risk_blocks';
     RAISE NOTICE '';
-    RAISE NOTICE 'New Views created: 3';
+    RAISE NOTICE 'New Views created: 4';
     RAISE NOTICE '  - leaderboard';
+    RAISE NOTICE '  - users_with_rank';
     RAISE NOTICE '  - accident_hotspots';
     RAISE NOTICE '  - high_risk_areas';
     RAISE NOTICE '';
     RAISE NOTICE 'Column added to issues: user_id';
+    RAISE NOTICE '';
+    RAISE NOTICE 'New Functions created: 4';
+    RAISE NOTICE '  - accidents_dashboard';
+    RAISE NOTICE '  - refresh_user_rankings';
+    RAISE NOTICE '  - update_user_rank_incremental';
+    RAISE NOTICE '  - increment_user_counters';
     RAISE NOTICE '========================================';
 END $$;